@@ -0,0 +1,104 @@
+import mmap
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+
+class BookContentCache:
+    """
+    Book texts kept between searches, keyed by file path and modification
+    time (a re-downloaded book is read again), bounded in bytes with LRU
+    eviction. Every process has its own (the engine pool workers too).
+
+    mode:
+      - "decoded" : the decoded str, no IO nor decode on a hit. CPython stores
+                    it compactly (1 byte per char for latin-1 text).
+      - "mmap"    : the read-only file mapping, decoded on each use. Its pages
+                    are the OS page cache, shared by every process mapping the
+                    same book: no IO and no private copy, only the decode.
+                    An evicted mapping is not closed, only dropped: a search
+                    still decoding it keeps it open until it is done.
+    """
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024, mode: str = "decoded", encoding: str = "utf-8"):
+        if mode not in ("decoded", "mmap"):
+            raise ValueError(f"Unknown book cache mode: {mode}")
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.encoding = encoding
+
+        self.entries = OrderedDict()  # path -> (mtime_ns, size on disk, str or mmap, bytes)
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path: str) -> str:
+        """Text of the file at `path`, decoded outside the lock"""
+        stat = os.stat(path)
+        content = None
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                content = entry[2]
+            else:
+                self.misses += 1
+
+        if content is None:
+            if stat.st_size == 0:
+                return ""
+            content = self.load(path)
+            self.store(path, (stat.st_mtime_ns, stat.st_size, content,
+                              len(content) if self.mode == "mmap" else sys.getsizeof(content)))
+        return self.text(content)
+
+    def load(self, path: str):
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mode == "mmap":
+            return mm
+        with mm:
+            return str(mm, self.encoding, "replace")
+
+    def text(self, content) -> str:
+        return str(content, self.encoding, "replace") if self.mode == "mmap" else content
+
+    def store(self, path: str, entry):
+        size = entry[3]
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if path in self.entries:
+                self.total_bytes -= self.entries.pop(path)[3]
+            self.entries[path] = entry
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted[3]
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'mode': self.mode,
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+BOOK_CACHE = BookContentCache(int(os.environ.get("ENGINE_BOOK_CACHE_BYTES", 128 * 1024 * 1024)),
+                              os.environ.get("ENGINE_BOOK_CACHE_MODE", "decoded"))
@@ -0,0 +1,38 @@
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+
+class BookCatalog:
+    """
+    Books downloaded by DataFetcher, from its catalog.json:
+    {book_id: {"id", "title", "author", "file_path", ...}}.
+    The file is reloaded when it changes (a new fetch), like the saved indexes.
+    """
+
+    def __init__(self, path="../books_data/catalog.json"):
+        self.path = Path(path)
+        self.books: Dict[str, Dict] = {}
+        self.mtime = None
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        mtime = self.path.stat().st_mtime
+        with self.lock:
+            if mtime != self.mtime:
+                with open(self.path, 'r', encoding='utf-8', errors='ignore') as f:
+                    self.books = json.load(f)
+                self.mtime = mtime
+
+    def resolve(self, book_ids: Iterable[int]) -> Tuple[List[Tuple[int, Dict]], List[int]]:
+        """([(book_id, catalog entry)], ids missing from the catalog)"""
+        self.refresh()
+        found, missing = [], []
+        for book_id in book_ids:
+            entry = self.books.get(str(book_id))
+            if entry is None or not entry.get('file_path'):
+                missing.append(book_id)
+            else:
+                found.append((book_id, entry))
+        return found, missing
@@ -5,11 +5,29 @@ from __future__ import annotations
 import sys
 import os
 import argparse
-from typing import Iterable, Iterator, Optional, Tuple
+import glob
+import json
+import mmap
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+import threading
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple
 from search_algorithms.kmp import KMP
 from search_algorithms.nfa import NFA
-from search_algorithms.dfa import DFA
-from search_algorithms.boyer_moore import Boyer
+from search_algorithms.dfa import DFA, DEAD, StateLimitExceeded
+from search_algorithms.lazy_dfa import LazyDFA
+from search_algorithms.nfa_sim import NFASimulator
+from search_algorithms.boyer_moore import Boyer, Horspool
+from search_algorithms.shift_or import ShiftOr
+from search_algorithms.aho_corasick import AhoCorasick
+from search_algorithms.literals import analyze
+from matcher_cache import MatcherCache
+from matcher_codec import dumps, loads
+from book_cache import BOOK_CACHE
+from engine_pool import Job
 
 
 # ============================================================
@@ -25,30 +43,288 @@ _DEMO_STATE = {"pattern": None}
 
 _engine = None  # stockage global provisoire
 
+# Above this many NFA states the DFA is built lazily (bounded state cache)
+LAZY_DFA_NFA_STATES = 400
+# Subset construction budget of a pattern coming from the API: a DFA (or
+# scanning DFA) that would have more states is replaced by a lazy DFA. The NFA
+# size can't tell, (a|b)*a(a|b)(a|b)... doubles its DFA with every (a|b)
+UNTRUSTED_DFA_STATES = 1024
+# A pattern coming from the API is "light" when its DFAs have at most this many
+# states, the server spends no more than that on classifying it
+LIGHT_DFA_STATES = 256
+# Texts shorter than this * NFA states * symbol classes are cheaper to scan
+# with the NFA simulation than to compile a DFA for
+NFA_SIM_TEXT_FACTOR = 50
+
+# Compiled matchers, shared on disk by every process using the same ENGINE_CACHE_DIR
+MATCHER_CACHE = MatcherCache(cache_dir=os.environ.get("ENGINE_CACHE_DIR"))
+# Matchers compiled in the engine pool workers, as this process keeps them (see pool_matcher)
+POOL_MATCHERS = MatcherCache(max_entries=1024)
+# Cost classes of the patterns already classified, by (pattern, mode)
+PATTERN_COSTS = OrderedDict()
+PATTERN_COSTS_SIZE = 4096
+_PATTERN_COSTS_LOCK = threading.Lock()
+
+
+def build_regex(pattern: str, untrusted: bool = False, text_length: Optional[int] = None,
+                ignore_case: bool = False):
+    """
+    Build the regex matcher:
+      - NFA simulation when the text to scan is short (no compilation cost)
+      - a full minimized DFA for small patterns
+      - a lazy DFA for large ones, and for untrusted ones whose DFA goes over
+        UNTRUSTED_DFA_STATES, so compilation can't blow up
+    """
+    nfa = NFA(pattern, ignore_case=ignore_case)
+    if text_length is not None and nfa_sim_preferred(nfa, text_length):
+        return NFASimulator(nfa)
+    if len(nfa.states) > LAZY_DFA_NFA_STATES:
+        return LazyDFA(nfa)
+    if not untrusted:
+        return DFA(nfa)
+    try:
+        return DFA(nfa, max_states=UNTRUSTED_DFA_STATES)
+    except StateLimitExceeded:
+        return LazyDFA(nfa)
+
+def nfa_sim_preferred(nfa: NFA, text_length: int) -> bool:
+    """True when the text is too short to pay for compiling a DFA"""
+    return text_length < simulation_limit(nfa)
+
+
+def simulation_limit(nfa: NFA) -> int:
+    """Texts shorter than this are scanned by the NFA simulation"""
+    return NFA_SIM_TEXT_FACTOR * len(nfa.states) * nfa.n_classes
+
+def build_matcher(pattern: str, mode: str, ignore_case: bool = False,
+                  untrusted: bool = False, text_length: Optional[int] = None):
+    match mode:
+        case "kmp":
+            return KMP(pattern, ignore_case)
+        case "boyer":
+            return Boyer(pattern, ignore_case)
+        case "horspool":
+            return Horspool(pattern, ignore_case)
+        case "regex":
+            # The scanning DFAs are only built on the first scan: word
+            # generation never needs them
+            return build_regex(pattern, untrusted, text_length, ignore_case)
+        case "nfa":
+            return NFASimulator(NFA(pattern, ignore_case=ignore_case))
+        case "shiftor":
+            return ShiftOr(pattern, ignore_case)
+        case _:
+            raise ValueError(f"Unknown mode: {mode}")
+
+
+def compiled_matcher(pattern: str, mode: str, ignore_case: bool = False,
+                     untrusted: bool = False, text_length: Optional[int] = None):
+    """
+    Matcher for `pattern` in the given mode, from MATCHER_CACHE when it was
+    already compiled. A regex over a short text gets the NFA simulation, cached
+    as the "nfa" mode matcher, so a later, longer text still gets the DFA.
+    Untrusted regexes are cached apart: their DFA is built under a state
+    budget (it may be a lazy DFA), a trusted caller gets the full DFA.
+    """
+    if mode == "regex" and text_length is not None:
+        simulator = compiled_matcher(pattern, "nfa", ignore_case)
+        if nfa_sim_preferred(simulator.nfa, text_length):
+            return simulator
+
+    def build():
+        return build_matcher(pattern, mode, ignore_case, untrusted)
+
+    return MATCHER_CACHE.get((pattern, mode, ignore_case, untrusted and mode == "regex"), build)
+
+
+class PoolMatcher(NamedTuple):
+    """A compiled matcher as the parent of the pool tasks keeps it: only the workers load `blob`"""
+    kind: str  # matcher class name, part of the worker cache keys
+    blob: bytes  # matcher_codec form
+    separator_free: bool  # see separator_free, with BATCH_SEPARATOR
+    simulation_limit: int  # "nfa" mode: texts shorter than this prefer the NFA simulation
+
+    def nbytes(self) -> int:
+        return len(self.blob) + len(self.kind) + 200
+
+
+def pool_form(matcher, mode: str) -> PoolMatcher:
+    limit = simulation_limit(matcher.nfa) if mode == "nfa" else 0
+    return PoolMatcher(type(matcher).__name__, dumps(matcher),
+                       separator_free(matcher, mode, BATCH_SEPARATOR), limit)
+
+
+def compile_pool_matcher(pattern: str, mode: str, ignore_case: bool) -> PoolMatcher:
+    """Pool worker: the untrusted matcher, compiled (or cached) in this worker"""
+    return pool_form(compiled_matcher(pattern, mode, ignore_case, untrusted=True), mode)
+
+
+def pool_matcher(pattern: str, mode: str, ignore_case: bool, text_length: Optional[int], pool) -> PoolMatcher:
+    """
+    The untrusted matcher for texts of `text_length` chars, as sent to the
+    tasks of `pool`. An engine pool Job compiles it in one of its workers
+    (killed at the job's deadline): this process only keeps the result in
+    POOL_MATCHERS, it never builds nor loads the matcher itself.
+    """
+    if not isinstance(pool, Job):
+        return pool_form(compiled_matcher(pattern, mode, ignore_case, untrusted=True, text_length=text_length), mode)
+    if mode == "regex" and text_length is not None:
+        simulator = pool_matcher(pattern, "nfa", ignore_case, None, pool)
+        if text_length < simulator.simulation_limit:
+            return simulator
+    return POOL_MATCHERS.get((pattern, mode, ignore_case),
+                             lambda: pool.run(compile_pool_matcher, pattern, mode, ignore_case))
+
+
+def classify(pattern: str, mode: str, job: Job) -> str:
+    """
+    pattern_cost, computed in a worker of `job` (under its deadline) the first
+    time a (pattern, mode) is seen, then remembered in PATTERN_COSTS
+    """
+    cost = known_cost(pattern, mode)
+    if cost is None:
+        cost = job.run(pattern_cost, pattern, mode)
+        with _PATTERN_COSTS_LOCK:
+            PATTERN_COSTS[(pattern, mode)] = cost
+            if len(PATTERN_COSTS) > PATTERN_COSTS_SIZE:
+                PATTERN_COSTS.popitem(last=False)
+    return cost
+
+
+def known_cost(pattern: str, mode: str) -> Optional[str]:
+    """Cost class of an already classified pattern, None if it wasn't yet"""
+    with _PATTERN_COSTS_LOCK:
+        cost = PATTERN_COSTS.get((pattern, mode))
+        if cost is not None:
+            PATTERN_COSTS.move_to_end((pattern, mode))
+        return cost
+
+
+def pattern_cost(pattern: str, mode: str) -> str:
+    """
+    Cost class of a request, for the engine pool concurrency limits, from what
+    build_regex builds for it: "light" for a small DFA, "heavy" for the slow
+    scans (NFA simulation, lazy DFA) and for DFAs over LIGHT_DFA_STATES (costly
+    subset constructions, up to the UNTRUSTED_DFA_STATES fallback).
+    Building the NFA is linear in the pattern, each subset construction stops
+    past LIGHT_DFA_STATES states, but their cost also grows with the NFA: run it
+    in a pool worker (see classify). Raises on an invalid pattern.
+    """
+    if mode == "nfa":
+        return "heavy"
+    if mode != "regex":
+        return "light"
+    nfa = NFA(pattern)
+    if len(nfa.states) > LAZY_DFA_NFA_STATES:
+        return "heavy"
+    try:
+        dfa = DFA(nfa, max_states=LIGHT_DFA_STATES)
+    except StateLimitExceeded:
+        return "heavy"
+    return "light" if dfa.scanners() is not None else "heavy"
+
+
+def generate_page(pattern: str, max_length: int, max_words: int, cursor: Optional[str] = None,
+                  time_budget: Optional[float] = None) -> dict:
+    """
+    A page of accepted words in shortlex order, after `cursor`:
+    {"generated_words", "next_cursor" (None once the language is exhausted),
+    "stopped" ("time" when the page was cut by the time budget)}
+    """
+    matcher = compiled_matcher(pattern, "regex", untrusted=True)
+    enumerator = matcher.word_enumerator()
+    words = list(islice(enumerator.words(max_length, cursor, time_budget), max_words))
+    # Words come in shortlex order, the last one is where the next page resumes
+    if len(words) == max_words or enumerator.stopped:
+        next_cursor = words[-1] if words else cursor
+    else:
+        next_cursor = None
+    return {"generated_words": words, "next_cursor": next_cursor, "stopped": enumerator.stopped}
+
 # ============================================================
 # ENGINE FUNCTION
 # ============================================================
 
-def engine(pattern: str, file_to_run: str, mode: str,max_matches : int = 0, line_number : bool = False, ignore_case: bool = False) -> None:
-    """
-    Build and run the chosen engine on the given file.
-    """
-    # Build the matcher
+def describe_matcher(matcher, mode: str, stream=None) -> None:
+    """Print the algorithm in use (to stderr when stdout carries records)"""
     match mode:
         case "kmp":
-            print("Using KMP algorithm")
-            matcher = KMP(pattern)
+            name = "KMP"
         case "boyer":
-            print("Using Boyer-Moore algorithm")
-            matcher = Boyer(pattern)
+            name = "Boyer-Moore"
+        case "horspool":
+            name = "Boyer-Moore-Horspool"
         case "regex":
-            print("Using Regex (DFA) algorithm")
-            nfa = NFA(pattern)
-            matcher = DFA(nfa)
+            if isinstance(matcher, NFASimulator):
+                name = "Regex (NFA simulation)"
+            elif isinstance(matcher, LazyDFA):
+                name = "Regex (lazy DFA)"
+            else:
+                name = "Regex (DFA)"
+        case "nfa":
+            name = "Regex (NFA simulation)"
+        case "shiftor":
+            name = "Shift-Or"
+
+    print(f"Using {name} algorithm", file=stream)
+    print("Engine built successfully.\n", file=stream)
+
+
+def match_text(matcher, mode: str, text: str, max_matches: int = 0):
+    """Run a compiled matcher of the given mode over `text`, returns (indexes, count)"""
+    match mode:
+        case "kmp":
+            return matcher.match_kmp(text, max_matches)
+        case "boyer":
+            return matcher.match_boyer(text, max_matches)
+        case "horspool":
+            return matcher.match_horspool(text, max_matches)
+        case "regex" | "nfa":
+            return matcher.match_dfa(text, max_matches)
+        case "shiftor":
+            return matcher.match_shift_or(text, max_matches)
         case _:
             raise ValueError(f"Unknown mode: {mode}")
 
-    print("Engine built successfully.\n")
+
+def count_text(matcher, text: str, max_matches: int = 0) -> int:
+    """Number of matches, no offset list is built (every matcher has a count path)"""
+    return matcher.count(text, max_matches)
+
+
+def has_match(matcher, text: str) -> bool:
+    """Stops at the first match"""
+    return matcher.exists(text)
+
+
+def engine(pattern: str, file_to_run: str, mode: str,max_matches : int = 0, line_number : bool = False, ignore_case: bool = False,
+           whole_file: bool = False, jobs: int = 1, writer: Optional[ResultWriter] = None, action: str = "match") -> None:
+    """
+    Build and run the chosen engine on the given file.
+    whole_file : scan the whole (memory-mapped) file at once, indexes are absolute
+                 offsets and matches may span lines
+    jobs       : > 1 splits the file in chunks scanned by that many processes
+                 (same results as whole_file)
+    writer     : stream the results as records instead of the summary (see engine_stream)
+    action     : "match", "count" (-c) or "list" (-l), the last two need a writer
+    """
+    # Build the matcher
+    text_length = os.path.getsize(file_to_run) if file_to_run != "-" else None
+    matcher = compiled_matcher(pattern, mode, ignore_case, text_length=text_length)
+    describe_matcher(matcher, mode, sys.stderr if writer is not None else None)
+
+    if writer is not None:
+        engine_stream(matcher, mode, file_to_run, writer, action, max_matches, whole_file, jobs)
+        return
+
+    if jobs > 1 and file_to_run != "-":
+        indexes, count = parallel_scan(matcher, mode, file_to_run, jobs, max_matches)
+        print_offsets(indexes, count, LineIndex(read_file(file_to_run)) if line_number else None)
+        return
+
+    if whole_file:
+        engine_whole_file(matcher, mode, file_to_run, max_matches, line_number)
+        return
 
     all_indexes = []
     total_count = 0
@@ -56,15 +332,7 @@ def engine(pattern: str, file_to_run: str, mode: str,max_matches : int = 0, line
     with open(file_to_run, "r", encoding="utf-8", errors="replace") as f:
         for i, line in enumerate(f, start=1):
             line_proc = line.strip()
-            if ignore_case:
-                line_proc = line_proc.lower()
-            match mode:
-                case "kmp":
-                    indexes, count = matcher.match_kmp(line_proc, max_matches)
-                case "boyer":
-                    indexes, count = matcher.match_boyer(line_proc, max_matches)
-                case "regex":
-                    indexes, count = matcher.match_dfa(line_proc, max_matches)
+            indexes, count = match_text(matcher, mode, line_proc, max_matches)
             if count == 0:
                 continue
             if line_number:
@@ -82,36 +350,353 @@ def engine(pattern: str, file_to_run: str, mode: str,max_matches : int = 0, line
         print(f" Total matches found: {total_count} \n Indexes : {all_indexes}")
 
 
+def engine_stream(matcher, mode: str, path: str, writer: ResultWriter, action: str = "match",
+                  max_matches: int = 0, whole_file: bool = False, jobs: int = 1) -> None:
+    """
+    Results of one file as a stream of records. Line by line (the default) only
+    the current line's offsets are ever held, --whole-file and --jobs write the
+    records of each chunk as it is scanned (see stream_chunks). -c and -l use
+    the count-only kernels and -l stops at the first hit.
+    """
+    if jobs > 1 and path != "-":
+        pool = ProcessPoolExecutor(max_workers=jobs, initializer=init_scan_worker, initargs=(matcher, mode))
+        try:
+            stream_chunks(writer, action, FileScan(matcher, mode, path, max_matches, action, pool, jobs),
+                          max_matches)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        return
+
+    if whole_file and path != "-":
+        stream_chunks(writer, action, FileScan(matcher, mode, path, max_matches, action), max_matches)
+        return
+    if whole_file:
+        text = read_file(path)
+        if action == "count":
+            writer.count(path, count_text(matcher, text, max_matches))
+        elif action == "list":
+            if has_match(matcher, text):
+                writer.file(path)
+        else:
+            indexes, _ = match_text(matcher, mode, text, max_matches)
+            for offset, line in zip(indexes, line_numbers(text, indexes)):
+                writer.match(path, line, offset)
+        writer.flush()
+        return
+
+    total = 0
+    for i, line in enumerate_lines(open_maybe_stdin(path)):
+        line_proc = line.strip()
+        remaining = max_matches - total if max_matches > 0 else 0
+        if action == "list":
+            if has_match(matcher, line_proc):
+                writer.file(path)
+                break
+            continue
+        if action == "count":
+            total += count_text(matcher, line_proc, remaining)
+        else:
+            indexes, count = match_text(matcher, mode, line_proc, remaining)
+            for offset in indexes:
+                writer.match(path, i, offset)
+            total += count
+        if max_matches > 0 and total >= max_matches:
+            break
+
+    if action == "count":
+        writer.count(path, total)
+    writer.flush()
+
+
+def engine_whole_file(matcher, mode: str, file_to_run: str, max_matches: int = 0, line_number: bool = False) -> None:
+    """
+    One scan over the whole file: no per-line strings, absolute offsets.
+    Line numbers are only computed (from a lazy newline index) with -n.
+    """
+    text = read_file(file_to_run)
+    indexes, count = match_text(matcher, mode, text, max_matches)
+    print_offsets(indexes, count, LineIndex(text) if line_number else None)
+
+
+def print_offsets(indexes, count: int, lines: Optional[LineIndex] = None, prefix: str = "") -> None:
+    """Print absolute offsets, grouped by line when a LineIndex is given"""
+    if lines is None:
+        print(f"{prefix} Total matches found: {count} \n Indexes : {indexes}")
+        return
+    print_line_groups(indexes, [lines.line_of(offset) for offset in indexes], prefix)
+
+
+def print_line_groups(indexes, line_numbers, prefix: str = "") -> None:
+    current, line_indexes = None, []
+    for offset, line in zip(indexes, line_numbers):
+        if line != current and line_indexes:
+            print(f"{prefix}Line {current}: Total matches found: {len(line_indexes)}")
+            print(f"Indexes of matches: {line_indexes}\n")
+            line_indexes = []
+        current = line
+        line_indexes.append(offset)
+    if line_indexes:
+        print(f"{prefix}Line {current}: Total matches found: {len(line_indexes)}")
+        print(f"Indexes of matches: {line_indexes}\n")
+
+
+# ============================================================
+# STREAMED OUTPUT (--format, -c, -l)
+# ============================================================
+
+# Records are written to stdout in blocks of this many
+OUTPUT_BUFFER_RECORDS = 1024
+
+
+class ResultWriter:
+    """
+    CLI results written as they are found, one record per line:
+      plain  : file:line:offset   (-c: file:count, -l: file)
+      ndjson : {"file": ..., "line": ..., "offset": ...}
+    Records are buffered and written in blocks of OUTPUT_BUFFER_RECORDS,
+    flushed at the end of each file. The whole-file scans hand them over a
+    chunk at a time (see stream_chunks), so only the offsets of one chunk are
+    held, except for a lazy DFA or an NFA simulation with an unbounded
+    pattern, whose file is scanned in one piece.
+    """
+
+    def __init__(self, output_format: str = "plain", stream=None):
+        self.format = output_format
+        self.stream = stream if stream is not None else sys.stdout
+        self.buffer = []
+
+    def write(self, record: dict) -> None:
+        if self.format == "ndjson":
+            self.buffer.append(json.dumps(record, ensure_ascii=False))
+        else:
+            self.buffer.append(":".join(str(value) for value in record.values()))
+        if len(self.buffer) >= OUTPUT_BUFFER_RECORDS:
+            self.flush()
+
+    def match(self, path: str, line: int, offset: int) -> None:
+        self.write({"file": path, "line": line, "offset": offset})
+
+    def count(self, path: str, count: int) -> None:
+        self.write({"file": path, "count": count})
+
+    def file(self, path: str) -> None:
+        self.write({"file": path})
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.buffer.append("")
+            self.stream.write("\n".join(self.buffer))
+            self.buffer.clear()
+        self.stream.flush()
+
+
+def stream_chunks(writer: ResultWriter, action: str, scan: FileScan, max_matches: int = 0) -> int:
+    """
+    Records of one file, written chunk by chunk as `scan` hands them over: the
+    line numbers are counted along (the newlines of a chunk without matches are
+    only counted as bytes). Returns the matches found, their number stopped at
+    max_matches (1 or 0 for "list").
+    """
+    path = scan.path
+    total = 0
+    line, offset = 1, 0
+    for start, end, length, found in scan.chunks():
+        if action == "list":
+            total = int(found > 0)
+        elif action == "count":
+            total += found
+        elif found:
+            if max_matches != 0:
+                found = found[:max_matches - total]
+            text, _ = read_range(path, start, end)
+            for i, number in zip(found, line_numbers(text, found, line)):
+                writer.match(path, number, offset + i)
+            total += len(found)
+            line += text.count("\n")
+        else:
+            line += count_newlines(path, start, end)
+        offset += length
+        if action == "list" and total or max_matches != 0 and total >= max_matches:
+            break
+    if max_matches != 0:
+        total = min(total, max_matches)
+    if action == "count":
+        writer.count(path, total)
+    elif action == "list" and total:
+        writer.file(path)
+    writer.flush()
+    return total
+
+
+# ============================================================
+# MULTI-FILE SEARCH
+# ============================================================
+
+def expand_paths(paths: Iterable[str]) -> list:
+    """Files to search: directories are walked recursively, glob patterns expanded"""
+    files = []
+    for path in paths:
+        if path == "-":
+            files.append(path)
+        elif os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names))
+        elif glob.has_magic(path):
+            files.extend(f for f in sorted(glob.glob(path, recursive=True)) if os.path.isfile(f))
+        else:
+            files.append(path)
+    return files
+
+
+def scan_file(path: str, max_matches: int = 0, line_number: bool = False, action: str = "match"):
+    """
+    Worker: whole-file scan of one file with the pool's matcher.
+    Returns (path, offsets, count, line numbers or None, error or None), offsets
+    are only collected for action "match" (for "list" the count is 0 or 1).
+    """
+    matcher, mode = _SCAN_WORKER["matcher"], _SCAN_WORKER["mode"]
+    try:
+        text = read_file(path)
+    except OSError as e:
+        return path, [], 0, None, str(e)
+    if action == "count":
+        return path, [], count_text(matcher, text, max_matches), None, None
+    if action == "list":
+        return path, [], int(has_match(matcher, text)), None, None
+    indexes, count = match_text(matcher, mode, text, max_matches)
+    lines = None
+    if line_number and indexes:
+        line_index = LineIndex(text)
+        lines = [line_index.line_of(offset) for offset in indexes]
+    return path, indexes, count, lines, None
+
+
+def engine_files(pattern: str, paths: list, mode: str, max_matches: int = 0, line_number: bool = False,
+                 ignore_case: bool = False, jobs: int = 1, max_total: int = 0, ordered: bool = False,
+                 writer: Optional[ResultWriter] = None, action: str = "match") -> None:
+    """
+    Search many files with a pattern compiled once.
+    Files go to a pool of `jobs` processes, largest first so a big book doesn't
+    start last. Results are printed as each file completes, or in path order
+    with `ordered`. max_matches is per file, max_total for the whole search.
+    writer / action : as for engine(). The records are written chunk by chunk,
+                      one file after the other (in the largest first order
+                      without `ordered`) while the next ones are scanned.
+    """
+    sizes = {path: os.path.getsize(path) for path in paths}
+    matcher = compiled_matcher(pattern, mode, ignore_case, text_length=sum(sizes.values()))
+    describe_matcher(matcher, mode, sys.stderr if writer is not None else None)
+
+    init_scan_worker(matcher, mode)
+    schedule = sorted(paths, key=lambda path: -sizes[path])
+    pool = ProcessPoolExecutor(max_workers=jobs, initializer=init_scan_worker,
+                               initargs=(matcher, mode)) if jobs > 1 else None
+    if writer is not None:
+        try:
+            stream_files(writer, action, matcher, mode, paths if ordered else schedule, pool, jobs,
+                         max_matches, max_total)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+        return
+
+    if pool is not None:
+        futures = [pool.submit(scan_file, path, max_matches, line_number, action) for path in schedule]
+        finished = as_completed(futures)
+        if ordered:
+            by_path = dict(zip(schedule, futures))
+            finished = (by_path[path] for path in paths)
+        results = (future.result() for future in finished)
+    else:
+        order = paths if ordered else schedule
+        results = (scan_file(path, max_matches, line_number, action) for path in order)
+
+    total = 0
+    try:
+        for path, indexes, count, lines, error in results:
+            if error is not None:
+                sys.stderr.write(f"[ERREUR] {path} : {error}\n")
+                continue
+            if count == 0:
+                continue
+            if max_total != 0 and total + count > max_total:
+                count = max_total - total
+                indexes = indexes[:count]
+                lines = lines[:count] if lines is not None else None
+            total += count
+            if lines is None:
+                print(f"{path}: Total matches found: {count} \n Indexes : {indexes}")
+            else:
+                print_line_groups(indexes, lines, prefix=f"{path}: ")
+            if max_total != 0 and total >= max_total:
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    print(f" Total matches found in {len(paths)} files: {total}")
+
+
+def stream_files(writer: ResultWriter, action: str, matcher, mode: str, paths: list, pool, jobs: int,
+                 max_matches: int = 0, max_total: int = 0) -> None:
+    """
+    Records of many files, in `paths` order, see stream_chunks. With a pool,
+    the next 2 * jobs files are scanned (two chunks at a time each) while a
+    file is written.
+    """
+    ahead = 2 * jobs if pool is not None else 1
+    scans = {}
+    total = 0
+
+    def start(k: int):
+        try:
+            return FileScan(matcher, mode, paths[k], max_matches, action, pool)
+        except OSError as e:
+            return e
+
+    try:
+        for k, path in enumerate(paths):
+            for j in range(k, min(k + ahead, len(paths))):
+                if j not in scans:
+                    scans[j] = start(j)
+            scan = scans.pop(k)
+            budget = max_matches
+            if max_total != 0:
+                budget = min(budget, max_total - total) if budget != 0 else max_total - total
+            try:
+                if isinstance(scan, OSError):
+                    raise scan
+                total += stream_chunks(writer, action, scan, budget)
+            except OSError as e:
+                sys.stderr.write(f"[ERREUR] {path} : {e}\n")
+            if max_total != 0 and total >= max_total:
+                break
+    finally:
+        for scan in scans.values():
+            if isinstance(scan, FileScan):
+                scan.cancel()
+    writer.flush()
+
+
 def engine_text(
     pattern: str,
     text: str,
     mode: str,
     max_matches: int = 0,
     ignore_case: bool = False,
-    verbose: bool = False
+    verbose: bool = False,
+    untrusted: bool = False
 ) -> dict:
 
-    match mode:
-        case "kmp":
-            matcher = KMP(pattern)
-        case "boyer":
-            matcher = Boyer(pattern)
-        case "regex":
-            nfa = NFA(pattern)
-            matcher = DFA(nfa)
-        case _:
-            raise ValueError(f"Unknown mode: {mode}")
-
-    if ignore_case:
-        text = text.lower()
+    # Case folding is done by the matcher, offsets are on the original text
+    matcher = compiled_matcher(pattern, mode, ignore_case, untrusted, len(text))
 
-    match mode:
-        case "kmp":
-            indexes, count = matcher.match_kmp(text, max_matches)
-        case "boyer":
-            indexes, count = matcher.match_boyer(text, max_matches)
-        case "regex":
-            indexes, count = matcher.match_dfa(text, max_matches)
+    # Offsets are only collected when they are returned
+    if verbose:
+        indexes, count = match_text(matcher, mode, text, max_matches)
+    else:
+        count = count_text(matcher, text, max_matches)
 
     if verbose:
         return {
@@ -124,6 +709,638 @@ def engine_text(
         }
 
 
+def engine_words_text(
+    words: Iterable[str],
+    text: str,
+    max_matches: int = 0,
+    ignore_case: bool = False,
+    verbose: bool = False
+) -> dict:
+    """
+    Search a whole word list (e.g. DFA.generate_words output) in one pass
+    with Aho-Corasick, hits are reported per word.
+    """
+    return words_result(AhoCorasick(words, ignore_case), text, max_matches, verbose)
+
+
+def engine_words_texts(
+    words: Iterable[str],
+    texts: Iterable[str],
+    ignore_case: bool = False,
+    verbose: bool = False
+) -> list:
+    """engine_words_text for every text, the automaton is built once"""
+    matcher = AhoCorasick(words, ignore_case)
+    return [words_result(matcher, text, 0, verbose) for text in texts]
+
+
+def words_result(matcher: AhoCorasick, text: str, max_matches: int = 0, verbose: bool = False) -> dict:
+    if verbose:
+        hits, count = matcher.match_aho(text, max_matches)
+        return {
+            "total_count": count,
+            "words": {word: {"count": len(indexes), "indexes": indexes} for word, indexes in hits.items()}
+        }
+    else:
+        counts, count = matcher.count(text, max_matches)
+        return {
+            "total_count": count,
+            "words": counts
+        }
+
+
+# ============================================================
+# PARALLEL SCAN (--jobs)
+# ============================================================
+
+# Chunks are at most this big, so --max-matches can stop the scan early
+PARALLEL_CHUNK_BYTES = 8 * 1024 * 1024
+# Chunks of the streamed output (all the offsets of a chunk are held at once)
+STREAM_CHUNK_BYTES = 1024 * 1024
+# The speculative reverse DFA run saves its state every this many chars
+CHECKPOINT_CHARS = 4096
+# A chunk synchronizes when all the reverse DFA states merge within its last
+# this many chars, only tried for DFAs up to SYNC_MAX_STATES states
+SYNC_CHARS = 4096
+SYNC_MAX_STATES = 256
+
+# Set in each worker process by init_scan_worker
+_SCAN_WORKER = {}
+
+
+def init_scan_worker(matcher, mode: str) -> None:
+    """The matcher is compiled once, in the parent, and pickled to every worker"""
+    _SCAN_WORKER["matcher"] = matcher
+    _SCAN_WORKER["mode"] = mode
+
+
+def max_match_length(matcher, mode: str) -> Optional[int]:
+    """Longest possible match in chars, None when unbounded"""
+    if mode in ("kmp", "boyer", "horspool"):
+        return len(matcher.pattern)
+    if mode == "shiftor":
+        return matcher.m
+    return analyze(matcher.nfa.regex).max_len
+
+
+def chunk_bounds(path: str, size: int, chunk_bytes: int) -> list:
+    """Byte offsets splitting the file, each moved forward onto a UTF-8 char start"""
+    bounds = [0]
+    with open(path, "rb") as f:
+        position = chunk_bytes
+        while position < size:
+            f.seek(position)
+            head = f.read(4)
+            k = 0
+            while k < len(head) and 0x80 <= head[k] < 0xC0:  # continuation byte
+                k += 1
+            if position + k < size:
+                bounds.append(position + k)
+            position += k + chunk_bytes
+    bounds.append(size)
+    return bounds
+
+
+def count_newlines(path: str, start: int, end: int) -> int:
+    """Newlines in bytes [start, end) of the file (an UTF-8 '\\n' is always that byte)"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start).count(b"\n")
+
+
+def read_range(path: str, start: int, end: int, overlap: int = 0) -> Tuple[str, str]:
+    """Decoded bytes [start, end) of the file, and the `overlap` bytes after them"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start + overlap)
+    return (data[:end - start].decode("utf-8", "replace"),
+            data[end - start:].decode("utf-8", "replace"))
+
+
+def scan_chunk(path: str, start: int, end: int, overlap: int, max_matches: int, action: str = "match"):
+    """
+    Worker: matches starting in [start, end), the chunk is extended by `overlap`
+    bytes so a match crossing its end is still found (by this chunk only).
+    Returns (chars in the chunk, chunk-relative offsets), or their number for
+    action "count": the matches starting in the overlap are the matches of the
+    overlap alone. For "list", 1 if the extended chunk holds any match (any
+    match is one of the file).
+    """
+    matcher, mode = _SCAN_WORKER["matcher"], _SCAN_WORKER["mode"]
+    core, tail = read_range(path, start, end, overlap)
+    if action == "count":
+        return len(core), count_text(matcher, core + tail) - count_text(matcher, tail)
+    if action == "list":
+        return len(core), int(has_match(matcher, core + tail))
+    indexes, _ = match_text(matcher, mode, core + tail, max_matches)
+    return len(core), [i for i in indexes if i < len(core)]
+
+
+def reverse_scan(reverse: DFA, codes, state: int, checkpoints: Optional[dict] = None,
+                 count_only: bool = False):
+    """
+    Run the reverse '.*reverse(R)' DFA over `codes` from the end, starting in `state`.
+    Returns (match starts in decreasing order or their number with count_only,
+    final state, saved states, converged): saved states are {position: (state,
+    starts found so far)} every CHECKPOINT_CHARS chars. Given the checkpoints
+    of another run over the same codes, stops as soon as both runs are in the
+    same state at a checkpoint (converged = that position, else -1).
+    """
+    table, finals, n_classes = reverse.table, reverse.finals, reverse.n_classes
+    starts = []
+    found = 0
+    saved = {}
+    for i in range(len(codes) - 1, -1, -1):
+        state = table[state * n_classes + codes[i]]
+        if finals[state]:
+            found += 1
+            if not count_only:
+                starts.append(i)
+        if i % CHECKPOINT_CHARS == 0:
+            if checkpoints is not None and i in checkpoints and checkpoints[i][0] == state:
+                return (found if count_only else starts), state, saved, i
+            saved[i] = (state, found)
+    return (found if count_only else starts), state, saved, -1
+
+
+def synchronizes(reverse: DFA, codes) -> bool:
+    """
+    True when the reverse DFA ends in the same state over `codes` whatever state
+    it starts in: all its states are run at once, until they merge into one
+    within the first SYNC_CHARS chars. The final state of a speculative run
+    over `codes` is then the true one, whatever comes after them in the file.
+    """
+    if reverse.n_states > SYNC_MAX_STATES:
+        return False
+    table, n_classes = reverse.table, reverse.n_classes
+    states = set(range(reverse.n_states))
+    for i in range(len(codes) - 1, max(-1, len(codes) - 1 - SYNC_CHARS), -1):
+        cls = codes[i]
+        states = {table[state * n_classes + cls] for state in states}
+        if len(states) == 1:
+            return True
+    return len(states) == 1
+
+
+def scan_chunk_speculative(path: str, start: int, end: int, synchronize: bool = False,
+                           count_only: bool = False):
+    """
+    Worker for unbounded regexes: the reverse DFA state entering the chunk
+    depends on everything after it, so the chunk is scanned from a guessed
+    state (the reverse start state) and fixed up afterwards, see reconciled_chunks.
+    Every start found is a true one: the guess only misses the matches ending
+    past the chunk.
+    Returns (chars, starts or their number, final state, saved states,
+    synchronizes() when asked).
+    """
+    matcher = _SCAN_WORKER["matcher"]
+    reverse = matcher.scanners()[1]
+    core, _ = read_range(path, start, end)
+    codes = matcher.encode(core)
+    starts, state, saved, _ = reverse_scan(reverse, codes, reverse.start, count_only=count_only)
+    return len(core), starts, state, saved, synchronize and synchronizes(reverse, codes)
+
+
+def parallel_scan(matcher, mode: str, path: str, jobs: int, max_matches: int = 0, action: str = "match"):
+    """
+    Scan a file with `jobs` processes, each reading its own byte range (see
+    FileScan). Results are merged in offset order and, with max_matches, the
+    chunks not started yet are cancelled once enough are found.
+    action: "match", "count" (chunks only count, offsets is []) or "list"
+    (count is 0 or 1, the other chunks are cancelled at the first hit).
+    Returns (absolute offsets, count), the same as a whole-file scan.
+    """
+    pool = ProcessPoolExecutor(max_workers=jobs, initializer=init_scan_worker, initargs=(matcher, mode))
+    try:
+        indexes = []
+        count = 0
+        offset = 0
+        scan = FileScan(matcher, mode, path, max_matches, action, pool, jobs, PARALLEL_CHUNK_BYTES)
+        for _, _, length, found in scan.chunks():
+            if action != "match":
+                count += found
+            else:
+                indexes.extend(offset + i for i in found)
+                count = len(indexes)
+            offset += length
+            if max_matches != 0 and count >= max_matches:
+                indexes = indexes[:max_matches]
+                count = max_matches
+                break
+        if action == "list":
+            return [], int(count > 0)
+        return indexes, count
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+class Deferred:
+    """A task run in this process when its result is first asked for, in place of a pool Future"""
+
+    def __init__(self, fn, *args):
+        self.fn, self.args, self.value = fn, args, None
+
+    def result(self):
+        if self.fn is not None:
+            self.value = self.fn(*self.args)
+            self.fn = None
+        return self.value
+
+    def cancel(self) -> bool:
+        self.fn = None
+        return True
+
+
+class Prefetch:
+    """
+    The futures of `tasks` ((fn, *args) tuples), each submitted when the one
+    `ahead` places before it is waited on: the results not consumed yet stay few.
+    Iterating lets go of each future once the next one is asked for.
+    """
+
+    def __init__(self, submit, tasks: list, ahead: int):
+        self.submit, self.tasks, self.ahead = submit, tasks, ahead
+        self.futures = []
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def __getitem__(self, k: int):
+        while len(self.futures) <= min(k + self.ahead, len(self.tasks) - 1):
+            self.futures.append(self.submit(*self.tasks[len(self.futures)]))
+        return self.futures[k]
+
+    def __iter__(self):
+        for k in range(len(self.tasks)):
+            yield self[k]
+            self.futures[k] = None
+
+    def cancel(self) -> None:
+        for future in self.futures:
+            if future is not None:
+                future.cancel()
+
+
+class FileScan:
+    """
+    The chunk tasks of one file, submitted to `pool` (an executor whose workers
+    ran init_scan_worker) about 2 * jobs chunks ahead of the one being read, or
+    run here on demand without a pool. Chunks are of `chunk_bytes` at most
+    (STREAM_CHUNK_BYTES by default), fewer when `jobs` processes must share a
+    smaller file.
+    Bounded patterns: chunks overlap by the longest match, every chunk reports
+    the matches starting inside it. Unbounded regexes: speculative reverse DFA
+    runs, reconciled right to left. A lazy DFA or an NFA simulation has no
+    table to speculate with: the file is one task, scanned whole.
+    """
+
+    def __init__(self, matcher, mode: str, path: str, max_matches: int = 0, action: str = "match",
+                 pool=None, jobs: int = 1, chunk_bytes: Optional[int] = None):
+        self.matcher, self.path, self.action = matcher, path, action
+        self.pooled = pool is not None
+        if pool is None:
+            init_scan_worker(matcher, mode)
+        submit = pool.submit if pool is not None else Deferred
+        size = os.path.getsize(path)
+        self.longest = max_match_length(matcher, mode)
+        self.whole = self.longest is None and (not isinstance(matcher, DFA) or matcher.scanners() is None)
+        if self.whole:
+            self.ranges = [(0, size)]
+            self.futures = Prefetch(submit, [(scan_file, path, max_matches, False, action)], 0)
+            return
+
+        chunk_bytes = chunk_bytes or STREAM_CHUNK_BYTES
+        bounds = chunk_bounds(path, size, max(1, min(chunk_bytes, -(-size // jobs))))
+        self.ranges = list(zip(bounds, bounds[1:]))
+        count_only = action != "match"
+        if self.longest is None:
+            # Synchronized chunks let the first ones be reconciled (and their
+            # offsets let go) before the last ones are scanned
+            synchronize = max_matches != 0 or not count_only
+            tasks = [(scan_chunk_speculative, path, a, b, synchronize, count_only) for a, b in self.ranges]
+        else:
+            overlap = 4 * max(0, self.longest - 1)  # an UTF-8 char is at most 4 bytes
+            tasks = [(scan_chunk, path, a, b, overlap, max_matches, action) for a, b in self.ranges]
+        # -l waits on all the chunks at once
+        ahead = len(tasks) if action == "list" else 2 * jobs - 1
+        self.futures = Prefetch(submit, tasks, ahead if pool is not None else 0)
+
+    def chunks(self) -> Iterator[Tuple[int, int, int, object]]:
+        """
+        (start byte, end byte, chars, chunk-relative offsets or their number) of
+        every chunk, in file order. For "list" a pooled scan yields the first
+        chunk to hit (any match is one of the file), whichever it is.
+        The tasks left are cancelled when the caller stops.
+        """
+        try:
+            if self.whole:
+                path, indexes, count, _, error = self.futures[0].result()
+                if error is not None:
+                    raise OSError(error)
+                yield 0, self.ranges[0][1], 0, indexes if self.action == "match" else count
+                return
+
+            if self.action == "list" and self.pooled:
+                for future in as_completed([self.futures[k] for k in range(len(self.futures))]):
+                    if future.result()[1]:
+                        yield 0, 0, 0, 1
+                        return
+                if self.longest is not None:
+                    return
+
+            if self.longest is None:
+                chunks = reconciled_chunks(self.matcher, self.path, self.ranges, self.futures, self.action != "match")
+            else:
+                chunks = (future.result() for future in self.futures)
+            for (start, end), (length, found) in zip(self.ranges, chunks):
+                yield start, end, length, found
+        finally:
+            self.cancel()
+
+    def cancel(self) -> None:
+        self.futures.cancel()
+
+
+def reconcile_chunk(matcher: DFA, path: str, chunk, result, entering: int, count_only: bool = False):
+    """
+    Fix the speculative run of one chunk given the true state entering it (the
+    final state of the chunk after it). When it differs from the guess the chunk
+    is rescanned from the true state, but only until the two runs meet at a
+    checkpoint, the rest of the speculative run is then right.
+    Returns (match starts in decreasing order or their number, final state).
+    """
+    reverse = matcher.scanners()[1]
+    _, starts, final, saved, _ = result
+    if entering == reverse.start:
+        return starts, final
+    core, _ = read_range(path, *chunk)
+    fixed, state, _, converged = reverse_scan(reverse, matcher.encode(core), entering, saved, count_only)
+    if converged >= 0:
+        before = saved[converged][1]  # speculative starts at or after the meeting point
+        return (fixed + starts - before if count_only else fixed + starts[before:]), final
+    return fixed, state
+
+
+def reconciled_chunks(matcher: DFA, path: str, ranges, futures, count_only: bool = False) -> Iterator[Tuple[int, list]]:
+    """
+    (chars, chunk-relative match starts or their number) of every chunk, in chunk order, from
+    the scan_chunk_speculative futures. Chunks are reconciled right to left from
+    a chunk whose final state is known: the last one (nothing after it) or one
+    that synchronizes. So the chunks before a synchronized one are yielded without
+    waiting for the rest of the file, the caller may stop there.
+    """
+    reverse = matcher.scanners()[1]
+    results = []
+    first = 0  # first chunk not yielded yet
+    for k, future in enumerate(futures):
+        results.append(future.result())
+        if k == len(futures) - 1:
+            end, entering = k + 1, reverse.start
+        elif k > first and results[k][4]:
+            end, entering = k, results[k][2]
+        else:
+            continue
+        segment = []
+        for j in range(end - 1, first - 1, -1):
+            starts, entering = reconcile_chunk(matcher, path, ranges[j], results[j], entering, count_only)
+            segment.append((results[j][0], starts if count_only else starts[::-1]))
+        yield from reversed(segment)
+        results[first:end] = [None] * (end - first)
+        first = end
+
+
+# ============================================================
+# BOOK SEARCH (/engine/advancedSearch)
+# ============================================================
+
+# Books are dealt to the pool in about this many tasks per worker: the
+# compiled matcher is sent once per task, not once per book
+BOOK_TASKS_PER_WORKER = 4
+# Compiled matchers kept by each pool worker
+WORKER_MATCHERS = 16
+
+_WORKER_MATCHERS = OrderedDict()
+# Last BOOK_CACHE stats reported by each pool worker, by pid
+WORKER_BOOK_CACHE_STATS = {}
+
+
+def worker_matcher(key, blob: bytes):
+    """Load a matcher sent by the parent (matcher_codec), once per worker"""
+    matcher = _WORKER_MATCHERS.get(key)
+    if matcher is None:
+        matcher = loads(blob)
+        _WORKER_MATCHERS[key] = matcher
+        if len(_WORKER_MATCHERS) > WORKER_MATCHERS:
+            _WORKER_MATCHERS.popitem(last=False)
+    else:
+        _WORKER_MATCHERS.move_to_end(key)
+    return matcher
+
+
+def search_book(matcher, mode: str, path: str, max_matches: int = 0, verbose: bool = False) -> dict:
+    """One book, from the BOOK_CACHE of the process searching it"""
+    try:
+        text = BOOK_CACHE.get(path)
+    except OSError as e:
+        return {"error": str(e)}
+    if verbose:
+        indexes, count = match_text(matcher, mode, text, max_matches)
+        return {"total_count": count, "indexes": indexes}
+    return {"total_count": count_text(matcher, text, max_matches)}
+
+
+def search_book_group(key, blob: bytes, group, max_matches: int = 0, verbose: bool = False):
+    """
+    Worker: [(book_id, result)] for a group of (book_id, file path), returned
+    with the worker's pid and book cache stats.
+    """
+    matcher = worker_matcher(key, blob)
+    mode = key[1]
+    results = [(book_id, search_book(matcher, mode, path, max_matches, verbose)) for book_id, path in group]
+    return os.getpid(), BOOK_CACHE.stats(), results
+
+
+def search_books(pattern: str, books, mode: str = "regex", pool=None,
+                 workers: int = 1, max_matches: int = 0, ignore_case: bool = False,
+                 verbose: bool = False) -> Iterator[Tuple[int, dict]]:
+    """
+    Search many books with a pattern compiled once, books: [(book_id, file path)].
+    pool: anything with submit(fn, *args) -> Future (ProcessPoolExecutor,
+    engine_pool.Job), None to search in this process.
+    The parent only sends paths, every worker reads its books itself. Books are
+    dealt largest first over the tasks so the groups are about the same size.
+    The pattern is compiled (and the tasks submitted) right away, the returned
+    iterator yields (book_id, {"total_count", "indexes" with verbose} or
+    {"error"}) as groups complete. max_matches is per book.
+    """
+    sizes = {}
+    for book_id, path in books:
+        try:
+            sizes[book_id] = os.path.getsize(path)
+        except OSError:
+            sizes[book_id] = 0
+    text_length = max(sizes.values(), default=0)
+    if pool is None:
+        matcher = compiled_matcher(pattern, mode, ignore_case, untrusted=True, text_length=text_length)
+        return ((book_id, search_book(matcher, mode, path, max_matches, verbose)) for book_id, path in books)
+    compiled = pool_matcher(pattern, mode, ignore_case, text_length, pool)
+
+    n_groups = min(len(books), workers * BOOK_TASKS_PER_WORKER)
+    groups = [[] for _ in range(n_groups)]
+    for k, book in enumerate(sorted(books, key=lambda book: -sizes[book[0]])):
+        groups[k % n_groups].append(book)
+
+    key = (pattern, mode, ignore_case, compiled.kind)
+    futures = [pool.submit(search_book_group, key, compiled.blob, group, max_matches, verbose) for group in groups]
+    return book_group_results(futures)
+
+
+def book_group_results(futures) -> Iterator:
+    """Results of the search_book_group futures as they complete. Closing it cancels the rest"""
+    try:
+        for future in as_completed(futures):
+            pid, stats, results = future.result()
+            WORKER_BOOK_CACHE_STATS[pid] = stats
+            yield from results
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def book_cache_stats() -> dict:
+    """BOOK_CACHE metrics of this process and of the pool workers (as of their last task)"""
+    workers = dict(WORKER_BOOK_CACHE_STATS)
+    total = {name: sum(stats[name] for stats in workers.values())
+             for name in ('entries', 'bytes', 'hits', 'misses', 'evictions')}
+    return {'server': BOOK_CACHE.stats(), 'workers': workers, 'workers_total': total}
+
+
+# ============================================================
+# BATCH SEARCH (/engine/search)
+# ============================================================
+
+# Texts at least this long are searched by the pool, shorter ones are packed
+BATCH_LONG_TEXT = 256 * 1024
+# Short texts are joined into buffers of about this many chars
+BATCH_BUFFER_CHARS = 1024 * 1024
+# Joins the short texts: it must not be matchable by the pattern, see separator_free
+BATCH_SEPARATOR = "\x00"
+
+
+def separator_free(matcher, mode: str, separator: str) -> bool:
+    """True when no match of `matcher` can contain `separator`"""
+    if mode in ("kmp", "boyer", "horspool"):
+        return all(separator not in chars for chars in matcher.positions)
+    if mode == "shiftor":
+        return matcher.masks.get(separator, matcher.default_mask) == 0
+    if isinstance(matcher, DFA):
+        # Without its NFA: the separator must lead every state to DEAD
+        cls = matcher.classes.get(separator, 0)
+        return all(matcher.table[state * matcher.n_classes + cls] == DEAD for state in range(matcher.n_states))
+    nfa = matcher.nfa
+    cls = nfa.classes.get(separator, 0)
+    return all(cls not in row for row in nfa.class_transitions.values())
+
+
+def search_text(matcher, mode: str, text: str, max_matches: int = 0, verbose: bool = False) -> dict:
+    """engine_text with an already compiled matcher"""
+    if verbose:
+        indexes, count = match_text(matcher, mode, text, max_matches)
+        return {"total_count": count, "indexes": indexes}
+    return {"total_count": count_text(matcher, text, max_matches)}
+
+
+def search_packed(matcher, mode: str, texts: list, max_matches: int = 0, verbose: bool = False) -> list:
+    """
+    Results of many short texts from a single scan: the texts are joined by
+    BATCH_SEPARATOR (which no match can span) and every offset is mapped back
+    to its text with a binary search over the text starts.
+    """
+    starts = []
+    position = 0
+    for text in texts:
+        starts.append(position)
+        position += len(text) + len(BATCH_SEPARATOR)
+    indexes, _ = match_text(matcher, mode, BATCH_SEPARATOR.join(texts))
+
+    found = [[] for _ in texts]
+    for offset in indexes:
+        k = bisect_right(starts, offset) - 1
+        if max_matches == 0 or len(found[k]) < max_matches:
+            found[k].append(offset - starts[k])
+    if verbose:
+        return [{"total_count": len(offsets), "indexes": offsets} for offsets in found]
+    return [{"total_count": len(offsets)} for offsets in found]
+
+
+def search_text_group(key, blob: bytes, texts: list, max_matches: int = 0, verbose: bool = False) -> list:
+    """Worker: results of a group of long texts"""
+    matcher = worker_matcher(key, blob)
+    return [search_text(matcher, key[1], text, max_matches, verbose) for text in texts]
+
+
+def search_packed_group(key, blob: bytes, texts: list, max_matches: int = 0, verbose: bool = False) -> list:
+    """Worker: search_packed"""
+    return search_packed(worker_matcher(key, blob), key[1], texts, max_matches, verbose)
+
+
+def engine_texts(pattern: str, texts: list, mode: str = "regex", max_matches: int = 0,
+                 ignore_case: bool = False, verbose: bool = False, pool=None, workers: int = 1) -> list:
+    """
+    engine_text over many texts with one compiled matcher, results in the
+    order of `texts`. Short texts are packed into buffers of BATCH_BUFFER_CHARS
+    (one scan each), long ones are scanned alone. With a `pool` (see
+    search_books) buffers and long texts are spread over it. max_matches is per text.
+    """
+    text_length = sum(len(text) for text in texts)
+    if pool is None:
+        matcher = compiled_matcher(pattern, mode, ignore_case, untrusted=True, text_length=text_length)
+        packable = separator_free(matcher, mode, BATCH_SEPARATOR)
+    else:
+        compiled = pool_matcher(pattern, mode, ignore_case, text_length, pool)
+        packable = compiled.separator_free
+    if packable:
+        alone = [k for k, text in enumerate(texts) if len(text) >= BATCH_LONG_TEXT]
+        packs, batch, size = [], [], 0
+        for k, text in enumerate(texts):
+            if len(text) >= BATCH_LONG_TEXT:
+                continue
+            if batch and size + len(text) > BATCH_BUFFER_CHARS:
+                packs.append(batch)
+                batch, size = [], 0
+            batch.append(k)
+            size += len(text) + len(BATCH_SEPARATOR)
+        if batch:
+            packs.append(batch)
+    else:
+        alone, packs = list(range(len(texts))), []
+
+    results = [None] * len(texts)
+    if pool is None:
+        for batch in packs:
+            for k, result in zip(batch, search_packed(matcher, mode, [texts[k] for k in batch],
+                                                      max_matches, verbose)):
+                results[k] = result
+        for k in alone:
+            results[k] = search_text(matcher, mode, texts[k], max_matches, verbose)
+        return results
+
+    key, blob = (pattern, mode, ignore_case, compiled.kind), compiled.blob
+    groups = [alone[g::workers] for g in range(min(workers, len(alone)))]
+    futures = [(batch, pool.submit(search_packed_group, key, blob, [texts[k] for k in batch],
+                                   max_matches, verbose)) for batch in packs]
+    futures += [(group, pool.submit(search_text_group, key, blob, [texts[k] for k in group],
+                                    max_matches, verbose)) for group in groups]
+    try:
+        for group, future in futures:
+            for k, result in zip(group, future.result()):
+                results[k] = result
+    finally:
+        for _, future in futures:
+            future.cancel()
+    return results
+
+
 # ============================================================
 # UTILITIES
 # ============================================================
@@ -143,6 +1360,55 @@ def enumerate_lines(lines: Iterable[str]) -> Iterator[Tuple[int, str]]:
         yield i, line
 
 
+def read_file(path: str, *, encoding: str = "utf-8") -> str:
+    """
+    Whole file as one string, decoded straight from a memory map (no
+    intermediate bytes copy, no per-line strings). '-' reads stdin.
+    """
+    if path == "-":
+        return sys.stdin.read()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, encoding, "replace")
+
+
+def line_numbers(text: str, offsets, first: int = 1) -> Iterator[int]:
+    """Line number of each of the increasing `offsets`, counting the newlines of `text` along"""
+    line, previous = first, 0
+    for offset in offsets:
+        line += text.count("\n", previous, offset)
+        previous = offset
+        yield line
+
+
+class LineIndex:
+    """
+    Offset -> line number for a whole-file scan. The newline offsets are only
+    collected on the first lookup, then each lookup is a binary search.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.newlines = None
+
+    def build(self):
+        newlines = array("q")
+        text = self.text
+        position = text.find("\n")
+        while position >= 0:
+            newlines.append(position)
+            position = text.find("\n", position + 1)
+        self.newlines = newlines
+
+    def line_of(self, offset: int) -> int:
+        """1-based line number of the char at `offset`"""
+        if self.newlines is None:
+            self.build()
+        return bisect_left(self.newlines, offset) + 1
+
+
 
 # ============================================================
 # CLI
@@ -155,15 +1421,40 @@ def build_arg_parser() -> argparse.ArgumentParser:
         allow_abbrev=False,
     )
     p.add_argument("pattern", help="Pattern a chercher.")
-    p.add_argument("file", help="Chemin du fichier texte, ou '-' pour stdin.")
-    p.add_argument("-m", "--mode", choices=["kmp", "boyer", "regex"], default="regex",
-                   help="Choisir le moteur (regex par défaut).")
+    p.add_argument("files", nargs="+",
+                   help="Fichiers texte, dossiers (parcourus récursivement), motifs glob "
+                        "(ex. 'books_data/books/*.txt'), ou '-' pour stdin.")
+    p.add_argument("-m", "--mode", choices=["kmp", "boyer", "horspool", "regex", "nfa", "shiftor"], default="regex",
+                   help="Choisir le moteur (regex par défaut, nfa = simulation directe du NFA, "
+                        "horspool = Boyer–Moore–Horspool, "
+                        "shiftor = motifs courts avec classes [..] et '.').")
     p.add_argument("-n", "--line-number", action="store_true",
                    help="Afficher le numéro de ligne.")
     p.add_argument("-i", "--ignore-case", action="store_true",
                    help="Ignorer la casse.")
+    p.add_argument("--whole-file", action="store_true",
+                   help="Scanner tout le fichier d’un coup (mmap) : offsets absolus, "
+                        "correspondances sur plusieurs lignes possibles.")
+    p.add_argument("-j", "--jobs", type=int, default=1,
+                   help="Nombre de processus : un fichier est découpé en morceaux "
+                        "(offsets absolus, comme --whole-file), plusieurs fichiers sont répartis.")
     p.add_argument("--max-matches", type=int, default=0,
-                   help="Arrêter après N correspondances (>0).")
+                   help="Arrêter après N correspondances (>0), par fichier.")
+    p.add_argument("--max-total", type=int, default=0,
+                   help="Plusieurs fichiers : arrêter après N correspondances au total.")
+    p.add_argument("--ordered", action="store_true",
+                   help="Plusieurs fichiers : afficher dans l’ordre des chemins "
+                        "(par défaut, dès qu’un fichier est fini).")
+    p.add_argument("--format", choices=["summary", "plain", "ndjson"], default="summary",
+                   help="summary = résumé par ligne/fichier (par défaut) ; plain = un "
+                        "enregistrement fichier:ligne:offset par correspondance, écrit au fil "
+                        "de l’eau ; ndjson = pareil en JSON (un objet par ligne).")
+    counting = p.add_mutually_exclusive_group()
+    counting.add_argument("-c", "--count", action="store_true",
+                          help="N’afficher que le nombre de correspondances par fichier.")
+    counting.add_argument("-l", "--files-with-matches", action="store_true",
+                          help="N’afficher que les fichiers qui contiennent le motif "
+                               "(arrêt à la première correspondance).")
     p.add_argument("--dry-run", action="store_true",
                    help="N’affiche que la configuration (pas de match).")
     p.add_argument("--version", action="version",
@@ -178,21 +1469,52 @@ def build_arg_parser() -> argparse.ArgumentParser:
 def main(argv: Optional[list[str]] = None) -> int:
     args = build_arg_parser().parse_args(argv)
 
-    if args.file != "-" and not os.path.exists(args.file):
-        sys.stderr.write(f"[ERREUR] Fichier introuvable : {args.file}\n")
+    files = expand_paths(args.files)
+    if not files:
+        sys.stderr.write(f"[ERREUR] Aucun fichier : {' '.join(args.files)}\n")
         return 2
+    for path in files:
+        if path != "-" and not os.path.exists(path):
+            sys.stderr.write(f"[ERREUR] Fichier introuvable : {path}\n")
+            return 2
+
+    writer = None
+    action = "count" if args.count else "list" if args.files_with_matches else "match"
+    if args.format != "summary" or action != "match":
+        writer = ResultWriter("ndjson" if args.format == "ndjson" else "plain")
 
     try:
-        pattern = args.pattern.lower() if args.ignore_case else args.pattern
+        if len(files) > 1 or files[0] != args.files[0]:
+            if "-" in files:
+                sys.stderr.write("[ERREUR] '-' ne peut pas être combiné avec d’autres fichiers\n")
+                return 2
+            engine_files(
+                pattern=args.pattern,
+                paths=files,
+                mode=args.mode,
+                max_matches=args.max_matches,
+                line_number=args.line_number,
+                ignore_case=args.ignore_case,
+                jobs=args.jobs,
+                max_total=args.max_total,
+                ordered=args.ordered,
+                writer=writer,
+                action=action
+            )
+            return 0
 
         # Call the engine with the parsed arguments
         engine(
-            pattern=pattern,
-            file_to_run=args.file,
+            pattern=args.pattern,
+            file_to_run=files[0],
             mode=args.mode,
             max_matches=args.max_matches,
             line_number=args.line_number,
-            ignore_case=args.ignore_case
+            ignore_case=args.ignore_case,
+            whole_file=args.whole_file,
+            jobs=args.jobs,
+            writer=writer,
+            action=action
         )
 
     except Exception as e:
@@ -1,41 +1,228 @@
 # main.py
-from concurrent.futures import ProcessPoolExecutor
+import os
+import time
+from contextlib import contextmanager
 
-from fastapi import FastAPI
-from engine import engine_text
+from fastapi import FastAPI, HTTPException
+from engine import (engine_texts, engine_words_texts, search_books, classify, known_cost, generate_page,
+                    book_cache_stats, MATCHER_CACHE)
+from engine_pool import EnginePool, Job, PoolSaturated, JobTimeout, WorkerLost
+from book_catalog import BookCatalog
+from streaming import ndjson_response
 
-from functools import lru_cache
 from pydantic import BaseModel
-from typing import List
-from search_algorithms.nfa import NFA
-from search_algorithms.dfa import DFA
+from typing import List, Optional
 
 class SearchRequest(BaseModel):
     pattern: str
     texts: List[str]  # can handle one or multiple titles
     verbose: bool = False
+    mode: str = "regex"
+    ignore_case: bool = False
+    max_matches: int = 0  # per text
 
 class GenerateRequset(BaseModel):
     pattern: str
     max_length: int
     max_words: int
+    cursor: Optional[str] = None  # next_cursor of the previous page
+    stream: bool = False  # NDJSON: one {"word"} per line, then {"next_cursor", "stopped"}
+
+class WordsSearchRequest(BaseModel):
+    words: List[str]  # e.g. the output of /engine/generateWords
+    texts: List[str]
+    ignore_case: bool = False
+    verbose: bool = False
 
 class AdvancedSearchRequest(BaseModel):
     pattern: str
     book_ids: List[int]  # the books to load
     verbose: bool = False
+    mode: str = "regex"
+    ignore_case: bool = False
+    max_matches: int = 0  # per book
+    stream: bool = False  # NDJSON: one line per book, as soon as it is searched
 
 
 app = FastAPI()
 
+# Word generation is on the search hot path, a page never takes longer than this
+GENERATE_TIME_BUDGET = 2.0
+
+BOOK_CATALOG = BookCatalog(os.environ.get("ENGINE_CATALOG", "../books_data/catalog.json"))
+
+# Every compile / scan / generation of the endpoints runs in these processes.
+# Requests beyond ENGINE_MAX_PENDING in flight (or ENGINE_HEAVY_LIMIT heavy
+# patterns) get a 429, requests running longer than ENGINE_TIMEOUT seconds a 503.
+ENGINE_WORKERS = int(os.environ.get("ENGINE_WORKERS", os.cpu_count() or 1))
+ENGINE_POOL = EnginePool(
+    workers=ENGINE_WORKERS,
+    max_pending=int(os.environ.get("ENGINE_MAX_PENDING", 4 * ENGINE_WORKERS)),
+    class_limits={"heavy": int(os.environ.get("ENGINE_HEAVY_LIMIT", max(1, ENGINE_WORKERS // 2)))},
+    timeout=float(os.environ.get("ENGINE_TIMEOUT", 30))
+)
+# Longer patterns are refused before they are parsed
+ENGINE_MAX_PATTERN_LENGTH = int(os.environ.get("ENGINE_MAX_PATTERN_LENGTH", 4096))
+# A streamed word generation runs as pool tasks of this many words
+GENERATE_STREAM_SLICE = 1000
+
+
+@app.on_event("shutdown")
+def shutdown_engine_pool():
+    ENGINE_POOL.shutdown()
+
+
+@contextmanager
+def engine_errors():
+    """Engine pool and pattern errors as HTTP errors"""
+    try:
+        yield
+    except HTTPException:
+        raise
+    except PoolSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except (JobTimeout, WorkerLost) as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def admit(pattern: str, mode: str) -> Job:
+    """
+    A pool job for a request on `pattern`, in its cost class. A new pattern is
+    classified by the job itself, in a worker under its deadline, then the job
+    moves to its class.
+    """
+    with engine_errors():
+        if len(pattern) > ENGINE_MAX_PATTERN_LENGTH:
+            raise ValueError(f"Pattern longer than {ENGINE_MAX_PATTERN_LENGTH} characters")
+        cost = known_cost(pattern, mode)
+        if cost is not None:
+            return ENGINE_POOL.admit(cost)
+        job = ENGINE_POOL.admit()
+        try:
+            ENGINE_POOL.reclassify(job, classify(pattern, mode, job))
+        except BaseException:
+            job.release()
+            raise
+        return job
+
 
 @app.post("/engine/generateWords")
 def generate_words(request: GenerateRequset):
-    pattern = request.pattern
-    max_length = request.max_length
-    max_word = request.max_words
-    nfa = NFA(pattern)
-    dfa = DFA(nfa)
-    words = dfa.generate_words(max_words=max_word, max_length=max_length)
-    return {"generated_words": words}
+    job = admit(request.pattern, "regex")
+    if request.stream:
+        return ndjson_response(generated_records(job, request))
+    # stopped == "time": the page was cut by the time budget, not the end of the language
+    with job, engine_errors():
+        return job.run(generate_page, request.pattern, request.max_length, request.max_words,
+                       request.cursor, GENERATE_TIME_BUDGET)
+
+
+def generated_records(job: Job, request: GenerateRequset):
+    """
+    Streamed page: pool tasks of GENERATE_STREAM_SLICE words, each one resuming
+    after the last word of the previous one, sharing the page's time budget
+    """
+    with job:
+        started = time.monotonic()
+        cursor, remaining = request.cursor, request.max_words
+        page = {"next_cursor": cursor, "stopped": None}
+        while remaining > 0:
+            budget = GENERATE_TIME_BUDGET - (time.monotonic() - started)
+            if budget <= 0:
+                page = {"next_cursor": cursor, "stopped": "time"}
+                break
+            page = job.run(generate_page, request.pattern, request.max_length,
+                           min(remaining, GENERATE_STREAM_SLICE), cursor, budget)
+            yield [{"word": word} for word in page["generated_words"]]  # one write per task
+            remaining -= len(page["generated_words"])
+            cursor = page["next_cursor"]
+            if cursor is None or page["stopped"]:
+                break
+        yield {"next_cursor": page["next_cursor"], "stopped": page["stopped"]}
+
+
+@app.post("/engine/search")
+def search(request: SearchRequest):
+    """One pattern against many texts (e.g. titles): one compile, one round trip"""
+    job = admit(request.pattern, request.mode)
+    with job, engine_errors():
+        results = engine_texts(request.pattern, request.texts, request.mode, request.max_matches,
+                               request.ignore_case, request.verbose, job, ENGINE_WORKERS)
+    return {"results": results}
+
+
+@app.post("/engine/searchWords")
+def search_words(request: WordsSearchRequest):
+    # One Aho-Corasick pass per text instead of one search per word
+    with engine_errors(), ENGINE_POOL.admit() as job:
+        results = job.run(engine_words_texts, request.words, request.texts, request.ignore_case, request.verbose)
+    return {"results": results}
+
+
+@app.post("/engine/advancedSearch")
+def advanced_search(request: AdvancedSearchRequest):
+    """
+    Search the content of catalog books server-side: only the book ids travel,
+    the pattern is compiled once and the files are read by the pool workers.
+    Books with matches come first, by decreasing count. With stream, one NDJSON
+    line per book with matches (or unreadable), in completion order.
+    """
+    try:
+        books, missing = BOOK_CATALOG.resolve(dict.fromkeys(request.book_ids))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Book catalog not found")
+    entries = dict(books)
+    job = admit(request.pattern, request.mode)
+    try:
+        with engine_errors():
+            hits = search_books(request.pattern, [(book_id, entry['file_path']) for book_id, entry in books],
+                                request.mode, job, ENGINE_WORKERS, request.max_matches,
+                                request.ignore_case, request.verbose)
+    except HTTPException:
+        job.release()
+        raise
+
+    if request.stream:
+        def records():
+            with job:
+                for book_id in missing:
+                    yield {"book_id": book_id, "error": "not in the catalog"}
+                for book_id, hit in hits:
+                    if "error" in hit or hit["total_count"] > 0:
+                        yield {"book_id": book_id, "title": entries[book_id].get('title'), **hit}
+        return ndjson_response(records())
+
+    with job, engine_errors():
+        hits = dict(hits)
+
+    results, errors = [], []
+    for book_id, _ in books:
+        hit = hits[book_id]
+        if "error" in hit:
+            errors.append({"book_id": book_id, "error": hit["error"]})
+        elif hit["total_count"] > 0:
+            results.append({"book_id": book_id, "title": entries[book_id].get('title'), **hit})
+    results.sort(key=lambda result: -result["total_count"])
+    return {
+        "total_count": sum(result["total_count"] for result in results),
+        "results": results,
+        "missing": missing,
+        "errors": errors
+    }
+
+
+@app.get("/engine/cacheStats")
+def cache_stats():
+    return MATCHER_CACHE.stats()
+
+
+@app.get("/engine/poolStats")
+def pool_stats():
+    return ENGINE_POOL.stats()
+
 
+@app.get("/engine/bookCacheStats")
+def book_cache_statistics():
+    return book_cache_stats()
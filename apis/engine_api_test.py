@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+
+import engine_api
+from engine_api import engine_errors, admit
+from engine_pool import EnginePool, PoolSaturated, JobTimeout, WorkerLost
+
+
+@pytest.mark.parametrize("error, status", [
+    (PoolSaturated("busy"), 429),
+    (JobTimeout("too long"), 503),
+    (WorkerLost("died"), 503),
+    (ValueError("bad pattern"), 400),
+    (HTTPException(status_code=404), 404),
+])
+def test_engine_errors_status(error, status):
+    with pytest.raises(HTTPException) as raised:
+        with engine_errors():
+            raise error
+    assert raised.value.status_code == status
+    if status == 429:
+        assert raised.value.headers["Retry-After"]
+
+
+def test_admit_by_pattern_cost(monkeypatch):
+    pool = EnginePool(workers=1, max_pending=2, class_limits={"heavy": 1})
+    monkeypatch.setattr(engine_api, "ENGINE_POOL", pool)
+    monkeypatch.setattr(engine_api, "ENGINE_MAX_PATTERN_LENGTH", 100)
+
+    heavy = admit("a" + "(a|b)" * 10, "regex")
+    assert heavy.cost == "heavy"
+    with pytest.raises(HTTPException) as raised:
+        admit("(a|b)*a" + "(a|b)" * 10, "regex")
+    assert raised.value.status_code == 429
+
+    light = admit("ab*c", "regex")
+    assert light.cost == "light"
+    with pytest.raises(HTTPException) as raised:
+        admit("abc", "kmp")
+    assert raised.value.status_code == 429
+
+    # Classified once: known patterns are admitted in their class directly
+    heavy.release()
+    assert admit("a" + "(a|b)" * 10, "regex").cost == "heavy"
+    light.release()
+
+    with pytest.raises(HTTPException) as raised:
+        admit("(ab", "regex")
+    assert raised.value.status_code == 400
+    with pytest.raises(HTTPException) as raised:
+        admit("a" * 101, "kmp")
+    assert raised.value.status_code == 400
+    assert pool.stats()["in_flight"] == 1
+    pool.shutdown()
@@ -0,0 +1,231 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+
+class PoolSaturated(Exception):
+    """No room for another request (queue or cost class full): answer 429"""
+
+
+class JobTimeout(Exception):
+    """The request ran out of time, its running task's worker was killed"""
+
+
+class WorkerLost(Exception):
+    """A worker process died while running a task"""
+
+
+def worker_main(conn):
+    """Worker process: run the (fn, args) tasks sent on the pipe until it closes"""
+    while True:
+        try:
+            fn, args = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            reply = (True, fn(*args))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception as e:  # unpicklable result or exception
+            conn.send((False, RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+class Worker:
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class Job:
+    """One admitted request: its tasks run on the pool until its deadline"""
+
+    def __init__(self, pool: "EnginePool", cost: str, deadline: float):
+        self.pool = pool
+        self.cost = cost
+        self.deadline = deadline
+
+    def run(self, fn: Callable, *args):
+        return self.pool.run(self.deadline, fn, *args)
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """run() in the background, like ProcessPoolExecutor.submit"""
+        return self.pool.threads.submit(self.run, fn, *args)
+
+    def release(self):
+        self.pool.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class EnginePool:
+    """
+    Bounded pool of worker processes for the CPU-bound engine endpoints (the
+    GIL would otherwise serialize every DFA build and scan of the server).
+    - admission: at most `max_pending` requests in flight (running or waiting
+      for a worker) and at most class_limits[cost] of a cost class, beyond that
+      admit() raises PoolSaturated right away instead of queueing without bound
+    - deadline: every request has a timeout, a task still running when it
+      expires has its worker killed and replaced, the only way to stop a DFA
+      build or a scan. An expired request also stops counting as in flight.
+    Workers are spawned on demand and kept (warm matcher and book caches).
+    """
+
+    def __init__(self, workers: int = 2, max_pending: Optional[int] = None,
+                 class_limits: Optional[Dict[str, int]] = None, timeout: float = 30.0):
+        self.n_workers = workers
+        self.max_pending = max_pending if max_pending is not None else 4 * workers
+        self.class_limits = class_limits or {}
+        self.timeout = timeout
+        self.context = multiprocessing.get_context("spawn")
+
+        self.size = 0  # live or starting workers
+        self.idle = []
+        self.jobs = set()
+        self.cond = threading.Condition()
+        # Drives Job.submit, only n_workers tasks can run at once anyway
+        self.threads = ThreadPoolExecutor(max_workers=workers)
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.recycled = 0
+
+    # -----------------------------
+    # Admission
+    # -----------------------------
+    def admit(self, cost: str = "light", timeout: Optional[float] = None) -> Job:
+        now = time.monotonic()
+        with self.cond:
+            self.jobs = {job for job in self.jobs if job.deadline > now}
+            running = sum(1 for job in self.jobs if job.cost == cost)
+            limit = self.class_limits.get(cost)
+            if len(self.jobs) >= self.max_pending:
+                self.rejected += 1
+                raise PoolSaturated("Engine busy, too many requests in flight")
+            if limit is not None and running >= limit:
+                self.rejected += 1
+                raise PoolSaturated(f"Engine busy, too many {cost} patterns in flight")
+            job = Job(self, cost, now + (timeout if timeout is not None else self.timeout))
+            self.jobs.add(job)
+            self.admitted += 1
+        return job
+
+    def reclassify(self, job: Job, cost: str):
+        """Move an admitted job to another cost class, PoolSaturated if that class is full"""
+        now = time.monotonic()
+        with self.cond:
+            self.jobs = {other for other in self.jobs if other.deadline > now}
+            running = sum(1 for other in self.jobs if other.cost == cost and other is not job)
+            limit = self.class_limits.get(cost)
+            if limit is not None and running >= limit:
+                self.rejected += 1
+                raise PoolSaturated(f"Engine busy, too many {cost} patterns in flight")
+            job.cost = cost
+
+    def release(self, job: Job):
+        with self.cond:
+            self.jobs.discard(job)
+
+    # -----------------------------
+    # Workers
+    # -----------------------------
+    def checkout(self, deadline: float) -> Worker:
+        with self.cond:
+            while not self.idle:
+                if self.size < self.n_workers:
+                    self.size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise JobTimeout("No engine worker free before the deadline")
+                self.cond.wait(remaining)
+            else:
+                return self.idle.pop()
+        try:
+            return Worker(self.context)
+        except Exception:
+            with self.cond:
+                self.size -= 1
+            raise
+
+    def checkin(self, worker: Worker):
+        with self.cond:
+            self.idle.append(worker)
+            self.cond.notify()
+
+    def discard(self, worker: Worker):
+        worker.kill()
+        with self.cond:
+            self.size -= 1
+            self.recycled += 1
+            self.cond.notify()
+
+    def run(self, deadline: float, fn: Callable, *args):
+        """fn(*args) in a worker, killed if it is still running at `deadline`"""
+        if time.monotonic() >= deadline:
+            with self.cond:
+                self.timeouts += 1
+            raise JobTimeout("Request deadline expired")
+        worker = self.checkout(deadline)
+        try:
+            worker.conn.send((fn, args))
+            reply = worker.conn.recv() if worker.conn.poll(max(0.0, deadline - time.monotonic())) else None
+        except (EOFError, OSError):
+            self.discard(worker)
+            raise WorkerLost("Engine worker died")
+        except Exception:
+            self.checkin(worker)  # (un)pickling error, the worker is fine
+            raise
+        if reply is None:
+            self.discard(worker)
+            with self.cond:
+                self.timeouts += 1
+            raise JobTimeout("Engine request timed out, its worker was recycled")
+        self.checkin(worker)
+        ok, value = reply
+        if ok:
+            return value
+        raise value
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self.cond:
+            jobs = [job for job in self.jobs if job.deadline > now]
+            classes = {}
+            for job in jobs:
+                classes[job.cost] = classes.get(job.cost, 0) + 1
+            return {
+                'workers': self.size,
+                'idle': len(self.idle),
+                'in_flight': len(jobs),
+                'in_flight_by_class': classes,
+                'max_pending': self.max_pending,
+                'class_limits': self.class_limits,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'recycled': self.recycled
+            }
+
+    def shutdown(self):
+        self.threads.shutdown(wait=False, cancel_futures=True)
+        with self.cond:
+            workers, self.idle = self.idle, []
+        for worker in workers:
+            worker.kill()
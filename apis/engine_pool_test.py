@@ -0,0 +1,87 @@
+import os
+import time
+
+import pytest
+
+from engine_pool import EnginePool, PoolSaturated, JobTimeout, WorkerLost
+
+# Tasks are builtins: the spawned workers unpickle them without importing this module
+
+
+@pytest.fixture
+def pool():
+    pool = EnginePool(workers=1, max_pending=3, class_limits={"heavy": 1}, timeout=10.0)
+    yield pool
+    pool.shutdown()
+
+
+def test_run_in_a_worker(pool):
+    with pool.admit() as job:
+        assert job.run(pow, 2, 10) == 1024
+        assert job.submit(divmod, 7, 2).result() == (3, 1)
+        with pytest.raises(ValueError):
+            job.run(int, "not a number")
+        # A failing task leaves its worker usable
+        assert job.run(os.getpid) == job.run(os.getpid)
+    assert pool.stats()["recycled"] == 0
+
+
+def test_saturation(pool):
+    heavy = pool.admit("heavy")
+    with pytest.raises(PoolSaturated):
+        pool.admit("heavy")
+    light = [pool.admit(), pool.admit()]
+    with pytest.raises(PoolSaturated):
+        pool.admit()
+    assert pool.stats()["rejected"] == 2
+    assert pool.stats()["in_flight_by_class"] == {"heavy": 1, "light": 2}
+
+    heavy.release()
+    pool.admit("heavy").release()
+    for job in light:
+        job.release()
+    assert pool.stats()["in_flight"] == 0
+
+
+def test_reclassify(pool):
+    heavy = pool.admit("heavy")
+    job = pool.admit()
+    with pytest.raises(PoolSaturated):
+        pool.reclassify(job, "heavy")
+    assert job.cost == "light"
+    heavy.release()
+    pool.reclassify(job, "heavy")
+    assert job.cost == "heavy" and pool.stats()["in_flight_by_class"] == {"heavy": 1}
+    pool.reclassify(job, "heavy")  # its own place counts once
+    job.release()
+
+
+def test_expired_jobs_stop_counting(pool):
+    pool.admit("heavy", timeout=0.05)
+    time.sleep(0.1)
+    pool.admit("heavy").release()
+
+
+def test_timeout_recycles_the_worker(pool):
+    with pool.admit() as job:
+        pid = job.run(os.getpid)  # the worker is up before the short deadline starts
+    with pool.admit(timeout=0.5) as job:
+        with pytest.raises(JobTimeout):
+            job.run(time.sleep, 30)
+        # Past its deadline the job runs nothing more
+        with pytest.raises(JobTimeout):
+            job.run(pow, 2, 10)
+    stats = pool.stats()
+    assert stats["recycled"] == 1 and stats["timeouts"] == 2
+
+    with pool.admit() as job:
+        assert job.run(os.getpid) != pid
+
+
+def test_lost_worker_is_replaced(pool):
+    with pool.admit() as job:
+        with pytest.raises(WorkerLost):
+            job.run(os._exit, 3)
+        assert job.run(pow, 3, 2) == 9
+    assert pool.stats()["recycled"] == 1
+    assert pool.stats()["workers"] == 1
@@ -6,6 +6,7 @@ from pathlib import Path
 from typing import Dict, List, Optional
 from pydantic import BaseModel
 from concurrent.futures import ProcessPoolExecutor, as_completed
+from search_algorithms.term_dictionary import TermDictionary
 
 
 class Book(BaseModel):
@@ -25,6 +26,8 @@ class indexService:
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(exist_ok=True, parents=True)
         self.indexing_dict: Dict[str, List[Dict]] = {}
+        # index_type -> (mtime of the saved index, TermDictionary)
+        self.term_dictionaries: Dict[str, tuple] = {}
 
         # Separate status for each index type
         self.indexing_status = {
@@ -204,4 +207,14 @@ class indexService:
         status_file_name = f"index_status_{index_type}.json"
         status_file = self.storage_path / status_file_name
         with open(status_file, 'w', encoding='utf-8') as f:
-            json.dump(self.indexing_status, f, indent=2, ensure_ascii=False)
\ No newline at end of file
+            json.dump(self.indexing_status, f, indent=2, ensure_ascii=False)
+
+    def term_dictionary(self, index_type: str) -> TermDictionary:
+        """Sorted vocabulary of the saved index, reloaded when the file changes"""
+        index_file = self.storage_path / f"index_Table{index_type}.json"
+        mtime = index_file.stat().st_mtime
+        cached = self.term_dictionaries.get(index_type)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, TermDictionary.load(index_file))
+            self.term_dictionaries[index_type] = cached
+        return cached[1]
@@ -2,12 +2,20 @@ from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 from indexService import indexService
+from engine import compiled_matcher
+from streaming import ndjson_response
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
 class IndexRequest(BaseModel):
     index_type: str
 
+class TermSearchRequest(BaseModel):
+    pattern: str
+    index_type: str = "TC"
+    max_terms: int = 0
+    stream: bool = False  # NDJSON: one {"word", "postings"} per line, as the walk finds them
+
 class IndexStatus(BaseModel):
     is_indexing: bool
     progress: int
@@ -76,6 +84,33 @@ async def get_stats():
         'indexing_status': indexing_service.indexing_status
     }
 
+@app.post("/indexAPI/searchTerms")
+def search_terms(request: TermSearchRequest):
+    """
+    Indexed words fully matched by a regex, with their postings, in a single
+    walk of the vocabulary (replaces generateWords + one DB query per word)
+    """
+    if request.index_type not in ["T", "TC"]:
+        raise HTTPException(status_code=400, detail="index_type must be 'T' or 'TC'")
+    try:
+        dictionary = indexing_service.term_dictionary(request.index_type)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"{request.index_type} index not built yet")
+    try:
+        matcher = compiled_matcher(request.pattern, "regex", untrusted=True)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if request.stream:
+        return ndjson_response({'word': word, 'postings': dictionary.postings[word]}
+                               for word in dictionary.iter_match(matcher, request.max_terms))
+
+    terms = dictionary.match(matcher, request.max_terms)
+    return {
+        'count': len(terms),
+        'terms': [{'word': word, 'postings': dictionary.postings[word]} for word in terms]
+    }
+
 @app.get("/health")
 async def health_check():
     """Simple health check endpoint"""
@@ -8,6 +8,7 @@ from datetime import datetime
 from fastapi import Query
 from typing import List
 from contextlib import asynccontextmanager
+from streaming import ndjson_response
 
 # --- Password request model ---
 class BuildPasswordRequest(BaseModel):
@@ -150,11 +151,16 @@ async def get_stats():
     }
 
 @app.get("/jacardAPI/pagerank")
-async def get_pagerank(book_ids: List[int] = Query(...)):
-    """Return PageRank scores for the requested book IDs"""
+async def get_pagerank(book_ids: List[int] = Query(...), stream: bool = False):
+    """Return PageRank scores for the requested book IDs (stream: one NDJSON {"book_id", "score"} per line)"""
     if not jacard_graph.pagerank_scores:
         raise HTTPException(status_code=400, detail="PageRank not calculated yet")
 
+    if stream:
+        scores = jacard_graph.pagerank_scores
+        # Every score is known already: a single write
+        return ndjson_response([[{"book_id": book_id, "score": scores.get(book_id, 0.0)} for book_id in book_ids]])
+
     print(f"Looking for book_ids: {book_ids}")
     print(f"Type of first book_id: {type(book_ids[0])}")
 
@@ -0,0 +1,181 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Hashable, Optional
+
+from matcher_codec import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Part of the file names: bumped when the keys change, old files are ignored
+CACHE_VERSION = 4
+
+
+def footprint(matcher, data: Optional[bytes] = None) -> int:
+    """
+    Bytes a matcher is charged in the cache: the memory its nbytes() reports
+    (DFA tables, NFA, lazy state caches), else its encoded size (the literal
+    matchers hold about as much as their pattern)
+    """
+    nbytes = getattr(matcher, "nbytes", None)
+    if nbytes is not None:
+        return nbytes()
+    return len(data if data is not None else dumps(matcher))
+
+
+class MatcherCache:
+    """
+    LRU cache of compiled matchers (DFA, KMP, Boyer...) keyed by
+    (pattern, mode, ignore_case, untrusted), bounded in entries and in bytes.
+    Entries are charged their footprint, updated on every hit: scans build
+    more tables (scanning DFAs, lazy DFA states) after a matcher is cached.
+
+    With a `cache_dir`, compiled matchers are also written to disk (in the
+    matcher_codec format, which only holds data, never pickles): a restarted
+    worker starts warm, and every uvicorn worker pointing at the same
+    directory reuses what the others compiled. Files are written atomically
+    (temp file + rename) so concurrent workers never read a partial matcher.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024,
+                 cache_dir: Optional[str] = None, max_disk_entries: int = 4096):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_disk_entries = max_disk_entries
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(exist_ok=True, parents=True)
+
+        self.entries = OrderedDict()  # key -> (matcher, size in bytes)
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, build: Callable, cacheable: Callable = lambda matcher: True):
+        """
+        Return the matcher cached for `key`, building it with `build()` on a miss.
+        `cacheable(matcher)` can refuse to keep a freshly built matcher.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                matcher, size = entry
+                if hasattr(matcher, "nbytes"):
+                    self.entries[key] = (matcher, footprint(matcher))
+                    self.total_bytes += self.entries[key][1] - size
+                    self.evict()
+                return matcher
+
+        data = self.read(key)
+        if data is not None:
+            try:
+                matcher = loads(data)
+            except Exception:  # another format version or a damaged file: compiled again
+                matcher = None
+            if matcher is not None:
+                with self.lock:
+                    self.disk_hits += 1
+                self.store(key, matcher, footprint(matcher, data))
+                return matcher
+
+        with self.lock:
+            self.misses += 1
+        matcher = build()
+        if cacheable(matcher):
+            data = dumps(matcher) if self.cache_dir is not None else None
+            self.store(key, matcher, footprint(matcher, data))
+            if data is not None:
+                self.write(key, data)
+        return matcher
+
+    def store(self, key, matcher, size: int):
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (matcher, size)
+            self.total_bytes += size
+            self.evict()
+
+    def evict(self):
+        """Drop the least recently used entries until the bounds hold, under the lock"""
+        while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'cache_dir': str(self.cache_dir) if self.cache_dir else None
+            }
+
+    # -----------------------------
+    # Disk persistence
+    # -----------------------------
+    def path(self, key) -> Path:
+        digest = hashlib.sha256(repr((CACHE_VERSION, key)).encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{digest}.matcher"
+
+    def read(self, key) -> Optional[bytes]:
+        if self.cache_dir is None:
+            return None
+        path = self.path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)  # keeps the disk trimming LRU
+            return data
+        except OSError:
+            return None
+
+    def write(self, key, data: bytes):
+        if self.cache_dir is None:
+            return
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self.path(key))
+            self.trim_disk()
+        except OSError as e:
+            logger.warning("Could not persist compiled matcher: %s", e)
+
+    def trim_disk(self):
+        files = list(self.cache_dir.glob("*.matcher"))
+        if len(files) <= self.max_disk_entries:
+            return
+
+        def mtime(f):
+            try:
+                return f.stat().st_mtime
+            except OSError:  # removed by another worker
+                return 0
+
+        files.sort(key=mtime)
+        for f in files[:len(files) - self.max_disk_entries]:
+            try:
+                f.unlink()
+            except OSError:
+                pass
@@ -0,0 +1,35 @@
+from engine import build_matcher
+from matcher_cache import MatcherCache, footprint
+
+WORDS = "lorem|ipsum|dolor|sit|amet|consectetur|adipiscing|elit|sed|eiusmod"
+TEXT = " ".join(WORDS.split("|") * 20)
+
+
+def test_compiled_dfa_keeps_only_its_tables():
+    matcher = build_matcher(WORDS, "regex")
+    assert matcher.transitions is None and matcher.nfa_transitions is None
+    matcher.count(TEXT)
+    assert matcher._nfa is None
+    assert all(scanner._nfa is None and scanner.transitions is None for scanner in matcher.scanners())
+    # Word generation still works without the NFA
+    assert sorted(matcher.generate_words(max_words=20, max_length=20)) == sorted(WORDS.split("|"))
+
+
+def test_entries_are_charged_their_footprint():
+    cache = MatcherCache()
+    matcher = cache.get("key", lambda: build_matcher(WORDS, "regex"))
+    assert cache.stats()["bytes"] == footprint(matcher)
+
+    # The first scan builds the scanning DFAs and drops the NFA: charged on the next hit
+    charged = cache.stats()["bytes"]
+    matcher.count(TEXT)
+    assert footprint(matcher) != charged
+    assert cache.get("key", lambda: None) is matcher
+    assert cache.stats()["bytes"] == footprint(matcher)
+
+
+def test_byte_budget_evicts():
+    cache = MatcherCache(max_bytes=int(2.5 * footprint(build_matcher(WORDS, "regex"))))
+    for k in range(4):
+        cache.get(k, lambda: build_matcher(WORDS, "regex"))
+    assert cache.stats()["entries"] == 2 and cache.stats()["evictions"] == 2
@@ -0,0 +1,95 @@
+import json
+import struct
+import sys
+from array import array
+
+from search_algorithms.kmp import KMP
+from search_algorithms.nfa import NFA
+from search_algorithms.dfa import DFA
+from search_algorithms.lazy_dfa import LazyDFA
+from search_algorithms.nfa_sim import NFASimulator
+from search_algorithms.boyer_moore import Boyer, Horspool
+from search_algorithms.shift_or import ShiftOr
+
+MAGIC = b"DAARM"
+# Bumped whenever the layout changes, data in another version is refused
+FORMAT_VERSION = 1
+# (format version, header length)
+PREFIX = struct.Struct("<BI")
+
+# Matchers rebuilt from their pattern on load, they cost about as much to
+# build as to read back. Only a DFA is stored compiled.
+REBUILT_KINDS = {KMP: "kmp", Boyer: "boyer", Horspool: "horspool", ShiftOr: "shiftor",
+                 LazyDFA: "lazy_dfa", NFASimulator: "nfa_sim"}
+ARRAY_TYPES = ("i", "B")
+
+
+def dumps(matcher) -> bytes:
+    """
+    Compact, versioned form of a compiled matcher: a JSON header followed by
+    the raw bytes of its arrays (for a DFA the dense transition tables). No
+    pickle, loading it can't run code.
+    """
+    if isinstance(matcher, DFA):
+        header, arrays = matcher.export()
+        header["kind"] = "dfa"
+    else:
+        kind = REBUILT_KINDS.get(type(matcher))
+        if kind is None:
+            raise TypeError(f"Can't serialize {type(matcher).__name__}")
+        if isinstance(matcher, (LazyDFA, NFASimulator)):
+            pattern, ignore_case = matcher.nfa.regexPattern, matcher.nfa.ignore_case
+        else:
+            pattern, ignore_case = matcher.pattern, matcher.ignore_case
+        header, arrays = {"kind": kind, "pattern": pattern, "ignore_case": ignore_case}, []
+
+    header["byteorder"] = sys.byteorder
+    header["arrays"] = [[a.typecode, len(a)] for a in arrays]
+    encoded = json.dumps(header).encode("utf-8")
+    return b"".join([MAGIC, PREFIX.pack(FORMAT_VERSION, len(encoded)), encoded] + [a.tobytes() for a in arrays])
+
+
+def loads(data: bytes):
+    """The matcher written by dumps(), raises ValueError on anything else"""
+    if data[:len(MAGIC)] != MAGIC or len(data) < len(MAGIC) + PREFIX.size:
+        raise ValueError("Not a compiled matcher")
+    version, size = PREFIX.unpack_from(data, len(MAGIC))
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Compiled matcher format {version}, expected {FORMAT_VERSION}")
+    offset = len(MAGIC) + PREFIX.size
+    header = json.loads(data[offset:offset + size].decode("utf-8"))
+    offset += size
+
+    arrays = []
+    for typecode, length in header["arrays"]:
+        if typecode not in ARRAY_TYPES:
+            raise ValueError(f"Unexpected array type {typecode!r}")
+        values = array(typecode)
+        end = offset + length * values.itemsize
+        if end > len(data):
+            raise ValueError("Truncated compiled matcher")
+        values.frombytes(data[offset:end])
+        if header["byteorder"] != sys.byteorder:
+            values.byteswap()
+        arrays.append(values)
+        offset = end
+
+    kind = header["kind"]
+    if kind == "dfa":
+        return DFA.restore(header, arrays)
+    pattern, ignore_case = str(header["pattern"]), bool(header["ignore_case"])
+    match kind:
+        case "kmp":
+            return KMP(pattern, ignore_case)
+        case "boyer":
+            return Boyer(pattern, ignore_case)
+        case "horspool":
+            return Horspool(pattern, ignore_case)
+        case "shiftor":
+            return ShiftOr(pattern, ignore_case)
+        case "lazy_dfa":
+            return LazyDFA(NFA(pattern, ignore_case=ignore_case))
+        case "nfa_sim":
+            return NFASimulator(NFA(pattern, ignore_case=ignore_case))
+        case _:
+            raise ValueError(f"Unknown matcher kind {kind!r}")
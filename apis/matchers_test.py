@@ -0,0 +1,164 @@
+import random
+import re
+
+import pytest
+
+from engine import build_matcher, build_regex, match_text, count_text, has_match, generate_page
+from matcher_codec import dumps, loads
+from search_algorithms.nfa import NFA
+from search_algorithms.dfa import DFA
+from search_algorithms.lazy_dfa import LazyDFA
+from search_algorithms.term_dictionary import TermDictionary
+
+ALPHABET = "abcé \n"
+REGEXES = ["ab*c", "a.*b", "(a|b)*c", "é(a|c)*é", "aba", "a(b|c)(b|c)(b|c)a", "(ab|ba)+"]
+LITERALS = ["a", "aba", "é a", "bcb"]
+LITERAL_MODES = ["kmp", "boyer", "horspool", "shiftor"]
+
+
+def random_text(n: int, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    return "".join(rng.choice(ALPHABET) for _ in range(n))
+
+
+def reference(pattern: str, text: str, flags: int = 0) -> list:
+    """Every offset a match starts at, by brute force ('.' matches newlines, no empty matches)"""
+    regex = re.compile(pattern, re.DOTALL | flags)
+    return [i for i in range(len(text)) if regex.match(text, i)]
+
+
+TEXT = random_text(2000)
+
+
+@pytest.mark.parametrize("mode", ["regex", "nfa"])
+@pytest.mark.parametrize("pattern", REGEXES)
+def test_regex_matchers_find_every_start(pattern, mode):
+    matcher = build_matcher(pattern, mode)
+    expected = reference(pattern, TEXT)
+    assert match_text(matcher, mode, TEXT) == (expected, len(expected))
+    assert count_text(matcher, TEXT) == len(expected)
+    assert has_match(matcher, TEXT) == bool(expected)
+
+
+@pytest.mark.parametrize("mode", LITERAL_MODES)
+@pytest.mark.parametrize("pattern", LITERALS)
+def test_literal_matchers_find_every_occurrence(pattern, mode):
+    matcher = build_matcher(pattern, mode)
+    expected = reference(re.escape(pattern), TEXT)
+    assert match_text(matcher, mode, TEXT) == (expected, len(expected))
+    assert count_text(matcher, TEXT) == len(expected)
+    assert has_match(matcher, TEXT) == bool(expected)
+
+
+@pytest.mark.parametrize("mode", LITERAL_MODES + ["regex", "nfa"])
+def test_ignore_case(mode):
+    text = random_text(1000, seed=2).upper()
+    matcher = build_matcher("aBa", mode, ignore_case=True)
+    expected = reference("aba", text, re.IGNORECASE)
+    assert match_text(matcher, mode, text)[0] == expected
+
+
+@pytest.mark.parametrize("mode", ["kmp", "regex", "nfa"])
+@pytest.mark.parametrize("max_matches", [1, 5, 10000])
+def test_max_matches_keeps_the_first_ones(mode, max_matches):
+    matcher = build_matcher("ab", mode)
+    expected = reference("ab", TEXT)[:max_matches]
+    assert match_text(matcher, mode, TEXT, max_matches) == (expected, len(expected))
+    assert count_text(matcher, TEXT, max_matches) == len(expected)
+
+
+def test_missing_match():
+    for mode in LITERAL_MODES + ["regex", "nfa"]:
+        matcher = build_matcher("zz", mode)
+        assert match_text(matcher, mode, TEXT) == ([], 0)
+        assert not has_match(matcher, TEXT)
+
+
+def test_untrusted_regex_over_the_state_budget():
+    # The unanchored DFAs of a(a|b)^k have 2^k states: scanned by the lazy fallback
+    pattern = "a" + "(a|b)" * 11
+    text = random_text(3000, seed=3)
+    matcher = build_regex(pattern, untrusted=True)
+    assert matcher.scanners() is None
+    assert match_text(matcher, "regex", text)[0] == reference(pattern, text)
+
+    # (a|b)*a(a|b)^k blows up the anchored DFA itself
+    matcher = build_regex("(a|b)*a" + "(a|b)" * 11, untrusted=True)
+    assert isinstance(matcher, LazyDFA)
+
+
+@pytest.mark.parametrize("pattern", ["(a|b)*a(a|b)(a|b)(a|b)(a|b)c", "a.*b", "é(a|c)*é"])
+def test_lazy_dfa_eviction(pattern):
+    text = random_text(3000, seed=4)
+    expected = reference(pattern, text)
+
+    # A cache of a few states is flushed over and over, then falls back to simulation
+    for max_flushes in (1000, 2):
+        matcher = LazyDFA(NFA(pattern), max_cache_bytes=600, max_flushes=max_flushes)
+        assert match_text(matcher, "regex", text) == (expected, len(expected))
+        assert matcher.forward.flushes > 0 or matcher.backward.flushes > 0
+    assert matcher.simulating
+
+
+@pytest.mark.parametrize("mode", LITERAL_MODES + ["regex", "nfa"])
+def test_codec_round_trip(mode):
+    matcher = build_matcher("ab", mode)
+    restored = loads(dumps(matcher))
+    assert type(restored) is type(matcher)
+    assert match_text(restored, mode, TEXT) == match_text(matcher, mode, TEXT)
+
+
+def test_codec_keeps_the_scanners():
+    matcher = build_matcher("(a|b)*c", "regex")
+    matcher.scanners()
+    restored = loads(dumps(matcher))
+    assert restored._scanners is not None
+    assert match_text(restored, "regex", TEXT) == match_text(matcher, "regex", TEXT)
+
+
+def test_codec_refuses_bad_data():
+    blob = dumps(build_matcher("ab*c", "regex"))
+    for bad in (b"", b"not a matcher", blob[:len(blob) // 2], blob[:-1]):
+        with pytest.raises(ValueError):
+            loads(bad)
+
+
+def test_term_dictionary_walk():
+    rng = random.Random(5)
+    words = {"".join(rng.choice("abcé") for _ in range(rng.randint(1, 6))) for _ in range(500)}
+    dictionary = TermDictionary({word: [] for word in words})
+    for pattern in ["ab*c", "(a|b)*", "é.*", "a(b|c)a", "zz"]:
+        expected = sorted(w for w in words if re.fullmatch(pattern, w, re.DOTALL))
+        for matcher in (DFA(NFA(pattern)), LazyDFA(NFA(pattern))):
+            assert dictionary.match(matcher) == expected
+        assert dictionary.match(DFA(NFA(pattern)), max_terms=3) == expected[:3]
+
+
+def shortlex(words):
+    return sorted(words, key=lambda word: (len(word), word))
+
+
+def test_generate_page_cursor_paging():
+    pattern, max_length = "(a|bc)*d", 7
+    everything = generate_page(pattern, max_length, 10000)
+    assert everything["next_cursor"] is None
+    words = everything["generated_words"]
+    assert words == shortlex(words)
+    assert all(re.fullmatch(pattern, word) for word in words)
+
+    paged, cursor = [], None
+    while True:
+        page = generate_page(pattern, max_length, 7, cursor)
+        paged.extend(page["generated_words"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert paged == words
+
+
+def test_word_enumerator_resumes_after_a_cursor():
+    for matcher in (DFA(NFA("a(b|c)*")), LazyDFA(NFA("a(b|c)*"))):
+        words = list(matcher.word_enumerator().words(5))
+        assert words == shortlex(words)
+        for k in (0, 3, len(words) - 1):
+            assert list(matcher.word_enumerator().words(5, words[k])) == words[k + 1:]
@@ -0,0 +1,129 @@
+import io
+import random
+from concurrent.futures import Future
+
+import pytest
+
+import engine
+from engine import (build_matcher, match_text, count_text, has_match, parallel_scan, chunk_bounds,
+                    init_scan_worker, scan_chunk_speculative, reconciled_chunks, max_match_length, read_file,
+                    engine_stream, engine_files, ResultWriter, LineIndex)
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    """Chunks, checkpoints and synchronization windows of a few KB (workers are forked)"""
+    monkeypatch.setattr(engine, "PARALLEL_CHUNK_BYTES", 4000)
+    monkeypatch.setattr(engine, "STREAM_CHUNK_BYTES", 3000)
+    monkeypatch.setattr(engine, "CHECKPOINT_CHARS", 256)
+    monkeypatch.setattr(engine, "SYNC_CHARS", 256)
+
+
+@pytest.fixture(scope="module")
+def text_file(tmp_path_factory):
+    rng = random.Random(7)
+    path = tmp_path_factory.mktemp("scan") / "text.txt"
+    path.write_text("".join(rng.choice("abcdé\n ") for _ in range(40000)), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def sparse_file(tmp_path_factory):
+    """Matches of a.*b spanning several chunks: the speculative runs are wrong and reconciled"""
+    rng = random.Random(8)
+    path = tmp_path_factory.mktemp("scan") / "sparse.txt"
+    path.write_text("".join("b" if rng.random() < 0.0002 else rng.choice("acé\n") for _ in range(40000)),
+                    encoding="utf-8")
+    return str(path)
+
+
+BOUNDED = [("abc", "kmp"), ("é a", "boyer"), ("a(b|c)d", "regex"), ("aé", "regex")]
+UNBOUNDED = [("ab*c", "regex"), ("a.*b", "regex"), ("(a|b)*c", "regex"), ("é(a|d)*é", "regex")]
+
+
+@pytest.mark.parametrize("pattern, mode", BOUNDED + UNBOUNDED)
+@pytest.mark.parametrize("max_matches", [0, 1, 7, 500])
+def test_parallel_scan_equals_whole_file(small_chunks, text_file, pattern, mode, max_matches):
+    matcher = build_matcher(pattern, mode)
+    text = read_file(text_file)
+    assert parallel_scan(matcher, mode, text_file, 3, max_matches) == match_text(matcher, mode, text, max_matches)
+    assert parallel_scan(matcher, mode, text_file, 3, max_matches, "count") == \
+        ([], count_text(matcher, text, max_matches))
+    assert parallel_scan(matcher, mode, text_file, 3, 0, "list") == ([], int(has_match(matcher, text)))
+
+
+@pytest.mark.parametrize("pattern", ["a.*b", "zz*q", "zzq"])
+def test_parallel_scan_spanning_and_missing_matches(small_chunks, sparse_file, pattern):
+    matcher = build_matcher(pattern, "regex")
+    text = read_file(sparse_file)
+    for max_matches in (0, 3):
+        assert parallel_scan(matcher, "regex", sparse_file, 4, max_matches) == \
+            match_text(matcher, "regex", text, max_matches)
+    assert parallel_scan(matcher, "regex", sparse_file, 4, 0, "count") == ([], count_text(matcher, text))
+    assert parallel_scan(matcher, "regex", sparse_file, 4, 0, "list") == ([], int(has_match(matcher, text)))
+
+
+def test_chunk_bounds_cut_between_chars(text_file):
+    with open(text_file, "rb") as f:
+        data = f.read()
+    bounds = chunk_bounds(text_file, len(data), 1000)
+    assert bounds[0] == 0 and bounds[-1] == len(data)
+    assert bounds == sorted(set(bounds)) and len(bounds) > 30
+    for bound in bounds:
+        data[:bound].decode("utf-8")  # no UTF-8 sequence cut in two
+
+
+@pytest.mark.parametrize("synchronize", [False, True])
+@pytest.mark.parametrize("count_only", [False, True])
+def test_speculative_reconcile(small_chunks, sparse_file, synchronize, count_only):
+    """Speculative chunk runs fixed up right to left, without a process pool"""
+    matcher = build_matcher("a.*b", "regex")
+    assert max_match_length(matcher, "regex") is None
+    init_scan_worker(matcher, "regex")
+
+    with open(sparse_file, "rb") as f:
+        size = len(f.read())
+    bounds = chunk_bounds(sparse_file, size, engine.PARALLEL_CHUNK_BYTES)
+    ranges = list(zip(bounds, bounds[1:]))
+    assert len(ranges) > 4
+    futures = []
+    for start, end in ranges:
+        future = Future()
+        future.set_result(scan_chunk_speculative(sparse_file, start, end, synchronize, count_only))
+        futures.append(future)
+
+    found, offset = [], 0
+    for length, starts in reconciled_chunks(matcher, sparse_file, ranges, futures, count_only):
+        found.append(starts if count_only else [offset + i for i in starts])
+        offset += length
+
+    indexes, count = match_text(matcher, "regex", read_file(sparse_file))
+    if count_only:
+        assert sum(found) == count
+    else:
+        assert [i for chunk in found for i in chunk] == indexes
+
+
+def records(text, matcher, mode, path, max_matches=0):
+    indexes, _ = match_text(matcher, mode, text, max_matches)
+    lines = LineIndex(text)
+    return "".join(f"{path}:{lines.line_of(i)}:{i}\n" for i in indexes)
+
+
+@pytest.mark.parametrize("pattern, mode", [("abc", "kmp"), ("ab*c", "regex"), ("a.*b", "regex")])
+@pytest.mark.parametrize("max_matches", [0, 7])
+def test_streamed_records_equal_whole_file(small_chunks, sparse_file, text_file, pattern, mode, max_matches):
+    """Records written chunk by chunk, line numbers counted across the chunks"""
+    matcher = build_matcher(pattern, mode)
+    for path in (text_file, sparse_file):
+        expected = records(read_file(path), matcher, mode, path, max_matches)
+        for whole_file, jobs in ((True, 1), (False, 3)):
+            out = io.StringIO()
+            engine_stream(matcher, mode, path, ResultWriter(stream=out), "match", max_matches, whole_file, jobs)
+            assert out.getvalue() == expected
+
+    out = io.StringIO()
+    engine_files(pattern, [text_file, sparse_file], mode, max_matches, jobs=2, ordered=True,
+                 writer=ResultWriter(stream=out))
+    assert out.getvalue() == "".join(records(read_file(path), matcher, mode, path, max_matches)
+                                     for path in (text_file, sparse_file))
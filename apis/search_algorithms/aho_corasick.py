@@ -0,0 +1,133 @@
+from array import array
+from collections import deque
+from typing import Iterable
+from search_algorithms.case_folding import case_variants
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: finds every occurrence of every word in one pass
+    over the text, O(len(text) + matches) whatever the number of words.
+    Accepts any word list, e.g. the output of DFA.generate_words.
+
+    The automaton is fully array-backed:
+      - delta[node * n_classes + cls] : goto function with the failure links
+        already folded in, so each text char is a single table lookup
+      - word_at[node]   : index of the word ending at node (-1 if none)
+      - out_link[node]  : next node on the failure chain ending a word (-1 if none)
+      - first_out[node] : node itself if it ends a word, else out_link[node]
+    """
+
+    def __init__(self, words: Iterable[str], ignore_case: bool = False):
+        self.ignore_case = ignore_case
+        self.words = [w for w in dict.fromkeys(words) if w]
+        keys = [w.lower() for w in self.words] if ignore_case else self.words
+
+        # Symbol classes, class 0 = any char no word contains
+        chars = sorted({c for w in keys for c in w})
+        self.classes = {c: i + 1 for i, c in enumerate(chars)}
+        if ignore_case:
+            for c in chars:
+                for v in case_variants(c):
+                    self.classes.setdefault(v, self.classes[c])
+        self.n_classes = len(chars) + 1
+
+        self.build(keys)
+
+    def build(self, keys):
+        # Trie
+        children = [{}]
+        word_at = [-1]
+        for index, word in enumerate(keys):
+            node = 0
+            for c in word:
+                cls = self.classes[c]
+                child = children[node].get(cls)
+                if child is None:
+                    child = len(children)
+                    children.append({})
+                    word_at.append(-1)
+                    children[node][cls] = child
+                node = child
+            if word_at[node] < 0:
+                word_at[node] = index
+
+        # Failure links, BFS so a node's failure target is always complete before it
+        n = len(children)
+        k = self.n_classes
+        delta = array('i', bytes(4 * n * k))  # every missing edge goes back to the root
+        fail = array('i', bytes(4 * n))
+        out_link = array('i', [-1]) * n
+        queue = deque()
+        for cls, child in children[0].items():
+            delta[cls] = child
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            f = fail[node]
+            out_link[node] = f if word_at[f] >= 0 else out_link[f]
+            base = node * k
+            delta[base:base + k] = delta[f * k:(f + 1) * k]
+            for cls, child in children[node].items():
+                fail[child] = delta[f * k + cls]
+                delta[base + cls] = child
+                queue.append(child)
+
+        self.n_nodes = n
+        self.delta = delta
+        self.word_at = array('i', word_at)
+        self.out_link = out_link
+        self.first_out = array('i', [node if word_at[node] >= 0 else out_link[node] for node in range(n)])
+
+    def match_aho(self, text, max_matches=0):
+        """
+        Returns ({word: [start indexes]}, total number of hits)
+        Only the words found appear in the dict.
+        """
+        delta, k, classes = self.delta, self.n_classes, self.classes
+        word_at, out_link, first_out = self.word_at, self.out_link, self.first_out
+        lengths = [len(w) for w in self.words]
+        hits = {}
+        word_counter = 0
+        state = 0
+        for i, c in enumerate(text):
+            state = delta[state * k + classes.get(c, 0)]
+            node = first_out[state]
+            while node >= 0:
+                word = word_at[node]
+                hits.setdefault(word, []).append(i - lengths[word] + 1)
+                word_counter += 1
+                if word_counter >= max_matches and max_matches != 0:
+                    return {self.words[w]: idx for w, idx in hits.items()}, word_counter
+                node = out_link[node]
+        return {self.words[w]: idx for w, idx in hits.items()}, word_counter
+
+    def count(self, text, max_matches=0):
+        """Hits per word without building index lists: ({word: count}, total)"""
+        delta, k, classes = self.delta, self.n_classes, self.classes
+        word_at, out_link, first_out = self.word_at, self.out_link, self.first_out
+        counts = [0] * len(self.words)
+        word_counter = 0
+        state = 0
+        for c in text:
+            state = delta[state * k + classes.get(c, 0)]
+            node = first_out[state]
+            while node >= 0:
+                counts[word_at[node]] += 1
+                word_counter += 1
+                if word_counter >= max_matches and max_matches != 0:
+                    break
+                node = out_link[node]
+            if word_counter >= max_matches and max_matches != 0:
+                break
+        return {w: n for w, n in zip(self.words, counts) if n}, word_counter
+
+    def exists(self, text):
+        """True at the first hit of any word"""
+        delta, k, classes, first_out = self.delta, self.n_classes, self.classes, self.first_out
+        state = 0
+        for c in text:
+            state = delta[state * k + classes.get(c, 0)]
+            if first_out[state] >= 0:
+                return True
+        return False
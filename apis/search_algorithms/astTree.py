@@ -1,4 +1,4 @@
-from typing import List
+from typing import FrozenSet, List
 from enum import Enum
 
 class Operation(Enum):
@@ -10,12 +10,49 @@ class Operation(Enum):
     PARENTHESE_R = 6
     CONCAT = 7
     PROTECTION = 8
+    EPSILON = 9  # empty word, only produced by the simplifier
+    CLASS = 10   # character class [...], the set is in tree.charset
+
+
+class CharSet:
+    """
+    Set of characters matched by one position: `chars`, or every char but
+    `chars` when negated. '.' is the negated empty set.
+    """
+    def __init__(self, chars: FrozenSet[str], negated: bool = False):
+        self.chars = frozenset(chars)
+        self.negated = negated
+
+    def contains(self, c: str) -> bool:
+        return (c in self.chars) != self.negated
+
+    def __eq__(self, other):
+        return isinstance(other, CharSet) and self.chars == other.chars and self.negated == other.negated
+
+    def __hash__(self):
+        return hash((self.chars, self.negated))
+
+    def __str__(self):
+        if self.negated and not self.chars:
+            return "."
+        return "[" + ("^" if self.negated else "") + "".join(sorted(self.chars)) + "]"
+
+
+ANY = CharSet(frozenset(), negated=True)
+
+
+class RegExSyntaxError(Exception):
+    def __init__(self, message: str, position: int):
+        super().__init__(f"{message} at position {position}")
+        self.position = position
+
 
 class RegExTree:
     def __init__(self, root: Operation, subTrees: List['RegExTree'] = []):
         self.root = root
         self.subTrees = subTrees
         self.id = ""
+        self.charset = None  # CharSet of a CLASS leaf
 
     def rootToString(self) -> str:
         if self.root == Operation.CONCAT:
@@ -28,6 +65,10 @@ class RegExTree:
             return "|"
         elif self.root == Operation.DOT:
             return "."
+        elif self.root == Operation.EPSILON:
+            return "ε"
+        elif self.root == Operation.CLASS:
+            return str(self.charset)
         else:
             return str(self.root)
 
@@ -43,8 +84,20 @@ class RegExTree:
 
 
 class RegEx:
+    """
+    Recursive-descent parser, one pass over the pattern:
+        altern  := concat ('|' concat)*
+        concat  := postfix postfix*
+        postfix := atom ('*' | '+')*
+        atom    := char | '.' | '[' class ']' | '(' altern ')'
+        class   := '^'? (char | char '-' char)+
+    CONCAT and ALTERN are binary and left-associative, parentheses only group
+    (no PROTECTION node is left in the tree).
+    """
     def __init__(self, regex : str):
         self.regex = regex
+        self.tokens = []
+        self.pos = 0
 
     def chartoRoot(self, c : str):
         if c == ".":
@@ -62,164 +115,90 @@ class RegEx:
         else:
             return c
 
-    """
-    contain functions
-    """
-
-    def containParenthese(self, trees: List[RegExTree]) -> bool:
-        return any(t.root in (Operation.PARENTHESE_L, Operation.PARENTHESE_R) for t in trees)
-
-    def containEtoile(self, trees: List[RegExTree]) -> bool:
-        return any(t.root == Operation.ETOILE and not t.subTrees for t in trees)
-
-    def containConcat(self, trees: List[RegExTree]) -> bool:
-        firstFound = False
-        for t in trees:
-            if t.root != Operation.ALTERN and not firstFound:
-                firstFound = True
-                continue
-            if firstFound:
-                if t.root != Operation.ALTERN:
-                    return True
-                else:
-                    firstFound = False
-        return False
-
-    def containAltern(self, trees: List[RegExTree]) -> bool:
-        return any(t.root == Operation.ALTERN and not t.subTrees for t in trees)
-
-    def containPlus(self, trees: List[RegExTree]) -> bool:
-        return any(t.root == Operation.PLUS and not t.subTrees for t in trees)
-    """
-    process functions
-    """
-    def processParenthese(self, trees: List[RegExTree]) -> List[RegExTree]:
-        result = []
-        found = False
-        for t in trees:
-            if not found and t.root == Operation.PARENTHESE_R:
-                done = False
-                content = []
-                while not done and result:
-                    last = result.pop()
-                    if last.root == Operation.PARENTHESE_L:
-                        done = True
-                    else:
-                        content.insert(0, last)
-                if not done:
-                    raise Exception("Mismatched parentheses")
-                found = True
-                subTrees = [self.parseList(content)]
-                result.append(RegExTree(Operation.PROTECTION, subTrees))
-            else:
-                result.append(t)
-        if not found:
-            raise Exception("Closing parenthesis not found")
-        return result
-
-
-    def processEtoile(self, trees: List[RegExTree]) -> List[RegExTree]:
-        result = []
-        found = False
-        for t in trees:
-            if not found and t.root == Operation.ETOILE and not t.subTrees:
-                if not result:
-                    raise Exception("Etoile without preceding element")
-                found = True
-                last = result.pop()
-                result.append(RegExTree(Operation.ETOILE, [last]))
-            else:
-                result.append(t)
-        return result
-
-    def processPlus(self, trees: List[RegExTree]) -> List[RegExTree]:
-        result = []
-        found = False
-        for t in trees:
-            if not found and t.root == Operation.PLUS and not t.subTrees:
-                if not result:
-                    raise Exception("Plus without preceding element")
-                found = True
-                last = result.pop()
-                result.append(RegExTree(Operation.PLUS, [last]))
-            else:
-                result.append(t)
-        return result
-
-    def processConcat(self, trees: List[RegExTree]) -> List[RegExTree]:
-        result = []
-        found = False
-        firstFound = False
-        for t in trees:
-            if not found and not firstFound and t.root != Operation.ALTERN:
-                firstFound = True
-                result.append(t)
-                continue
-            if not found and firstFound and t.root == Operation.ALTERN:
-                firstFound = False
-                result.append(t)
-                continue
-            if not found and firstFound and t.root != Operation.ALTERN:
-                found = True
-                last = result.pop()
-                result.append(RegExTree(Operation.CONCAT, [last, t]))
-            else:
-                result.append(t)
-        return result
-
-    def processAltern(self, trees: List[RegExTree]) -> List[RegExTree]:
-        result = []
-        found = False
-        gauche = None
-        done = False
-        for t in trees:
-            if not found and t.root == Operation.ALTERN and not t.subTrees:
-                if not result:
-                    raise Exception("Altern without left element")
-                found = True
-                gauche = result.pop()
-                continue
-            if found and not done:
-                if gauche is None:
-                    raise Exception("Altern without left element")
-                done = True
-                result.append(RegExTree(Operation.ALTERN, [gauche, t]))
-            else:
-                result.append(t)
-        return result
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
 
     """
-     END PROCESS FUNCTIONS
+    parse functions
     """
 
-    def removeProtection(self, tree: RegExTree) -> RegExTree:
-        if tree.root == Operation.PROTECTION and len(tree.subTrees) != 1:
-            raise Exception("Protection node must have exactly one subtree")
-        if not tree.subTrees:
+    def parseAltern(self) -> RegExTree:
+        tree = self.parseConcat()
+        while self.peek() == Operation.ALTERN:
+            self.pos += 1
+            tree = RegExTree(Operation.ALTERN, [tree, self.parseConcat()])
+        return tree
+
+    def parseConcat(self) -> RegExTree:
+        start = self.pos
+        tree = None
+        while self.peek() not in (None, Operation.ALTERN, Operation.PARENTHESE_R):
+            atom = self.parsePostfix()
+            tree = atom if tree is None else RegExTree(Operation.CONCAT, [tree, atom])
+        if tree is None:
+            raise RegExSyntaxError("Empty expression", start)
+        return tree
+
+    def parsePostfix(self) -> RegExTree:
+        tree = self.parseAtom()
+        while self.peek() in (Operation.ETOILE, Operation.PLUS):
+            tree = RegExTree(self.peek(), [tree])
+            self.pos += 1
+        return tree
+
+    def parseAtom(self) -> RegExTree:
+        token = self.peek()
+        if token == Operation.PARENTHESE_L:
+            opening = self.pos
+            self.pos += 1
+            tree = self.parseAltern()
+            if self.peek() != Operation.PARENTHESE_R:
+                raise RegExSyntaxError("Closing parenthesis not found for '('", opening)
+            self.pos += 1
             return tree
-        if tree.root == Operation.PROTECTION:
-            return self.removeProtection(tree.subTrees[0])
-        subTrees = []
-        for t in tree.subTrees:  # fixed
-            subTrees.append(self.removeProtection(t))
-        return RegExTree(tree.root, subTrees)
-
-    # Parse list of RegExTree nodes
-    def parseList(self, trees: List[RegExTree]) -> RegExTree:
-        while self.containParenthese(trees):
-            trees = self.processParenthese(trees)
-        while self.containEtoile(trees):
-            trees = self.processEtoile(trees)
-        while self.containPlus(trees):
-            trees = self.processPlus(trees)
-        while self.containConcat(trees):
-            trees = self.processConcat(trees)
-        while self.containAltern(trees):
-            trees = self.processAltern(trees)
-        if len(trees) > 1:
-            raise Exception("Parsing did not produce a single tree")
-        return self.removeProtection(trees[0])
+        if token == Operation.ETOILE:
+            raise RegExSyntaxError("Etoile without preceding element", self.pos)
+        if token == Operation.PLUS:
+            raise RegExSyntaxError("Plus without preceding element", self.pos)
+        if token == "[":
+            return self.parseClass()
+        self.pos += 1
+        return RegExTree(token)
+
+    def parseClass(self) -> RegExTree:
+        """[abc], [a-z0-9], [^...] ; a ']' right after '[' or '[^' and a '-' at either end are literal"""
+        opening = self.pos
+        regex = self.regex
+        i = self.pos + 1
+        negated = i < len(regex) and regex[i] == "^"
+        if negated:
+            i += 1
+        chars = set()
+        first = True
+        while i < len(regex) and (regex[i] != "]" or first):
+            first = False
+            c = regex[i]
+            if i + 2 < len(regex) and regex[i + 1] == "-" and regex[i + 2] != "]":
+                high = regex[i + 2]
+                if ord(high) < ord(c):
+                    raise RegExSyntaxError(f"Invalid range {c}-{high}", i)
+                chars.update(chr(o) for o in range(ord(c), ord(high) + 1))
+                i += 3
+            else:
+                chars.add(c)
+                i += 1
+        if i >= len(regex):
+            raise RegExSyntaxError("Closing bracket not found for '['", opening)
+        self.pos = i + 1
+        tree = RegExTree(Operation.CLASS, [])
+        tree.charset = CharSet(frozenset(chars), negated)
+        return tree
 
     def parse(self) -> RegExTree:
-        trees = [RegExTree(self.chartoRoot(c)) for c in self.regex]
-        return self.parseList(trees)
+        self.tokens = [self.chartoRoot(c) for c in self.regex]
+        self.pos = 0
+        tree = self.parseAltern()
+        if self.pos < len(self.tokens):
+            # parseAltern only stops early on a ')' without its '('
+            raise RegExSyntaxError("Mismatched parentheses", self.pos)
+        return tree
@@ -1,46 +1,211 @@
+from search_algorithms.case_folding import variant_table
+
+# Chars of English text from the most to the least frequent, chars not listed
+# are considered rarer than all of them
+COMMON_CHARS = " etaoinshrdlucmfwygpbvkxqjz"
+
+
+def rarest_position(pattern: str, ignore_case: bool = False) -> int:
+    """Index of the pattern char least likely to appear in book text"""
+    def rank(c):
+        position = COMMON_CHARS.find(c.lower() if ignore_case else c)
+        return position if position >= 0 else len(COMMON_CHARS)
+    return max(range(len(pattern)), key=lambda k: rank(pattern[k]))
+
+
+def find_any(text: str, chars, start: int, hits: dict) -> int:
+    """
+    First index >= start of any of `chars` in text (-1 if none).
+    hits keeps the last position found for each char: a char is only searched
+    again once the scan has gone past it.
+    """
+    best = -1
+    for c in chars:
+        k = hits.get(c, -2)
+        if k != -1 and k < start:
+            k = text.find(c, start)
+            hits[c] = k
+        if k >= 0 and (best < 0 or k < best):
+            best = k
+    return best
+
+
 class Boyer:
-    def __init__(self, pattern):
+    """
+    Complete Boyer-Moore: bad character + good suffix rules, with Galil's rule
+    (after a match, the part of the new window overlapping it is not compared
+    again) for a linear worst case on periodic patterns.
+    Before each window is compared, str.find jumps to the next occurrence of the
+    pattern's rarest char: most of a book is skipped at C speed.
+    Reports every occurrence, overlapping ones included (like KMP).
+    With ignore_case every table is built on the case variants of the pattern
+    chars, the text is scanned as is.
+    """
+
+    def __init__(self, pattern, ignore_case=False):
         self.pattern = pattern
+        self.ignore_case = ignore_case
         self.m = len(pattern)
-        self.hoops = self.compute_hoops(pattern)
+        # positions[j] = chars matched by pattern[j] (see KMP)
+        self.positions = variant_table(pattern) if ignore_case else pattern
+        self.last = self.compute_last_occurrence(self.positions)
+        self.good_suffix = self.compute_good_suffix(self.positions)
+        self.rare = rarest_position(pattern, ignore_case) if pattern else 0
 
-    def compute_hoops(self, pattern):
-        hoops = {}
-        for i in range(len(pattern)):
-            hoops[pattern[i]] = max(1, self.m - i - 1)
-        # default skip for all other characters
-        hoops['*'] = self.m
-        return hoops
+    def compute_last_occurrence(self, positions):
+        """Bad character table: last index of each char in the pattern (absent chars: -1)"""
+        last = {}
+        for i, chars in enumerate(positions):
+            for c in chars:
+                last[c] = i
+        return last
 
+    def compute_good_suffix(self, pattern):
+        """
+        shift[j + 1] = safe shift after a mismatch at pattern[j] (the suffix after
+        j matched), shift[0] = shift after a full match (the pattern's period).
+        """
+        m = len(pattern)
+        shift = [0] * (m + 1)
+        border = [0] * (m + 1)
 
-    def match_boyer(self, text, max_match = 0):
+        # Case 1: the matched suffix occurs elsewhere in the pattern
+        i, j = m, m + 1
+        border[i] = j
+        while i > 0:
+            while j <= m and pattern[i - 1] != pattern[j - 1]:
+                if shift[j] == 0:
+                    shift[j] = j - i
+                j = border[j]
+            i -= 1
+            j -= 1
+            border[i] = j
+
+        # Case 2: only a part of the matched suffix is a prefix of the pattern
+        j = border[0]
+        for i in range(m + 1):
+            if shift[i] == 0:
+                shift[i] = j
+            if i == j:
+                j = border[j]
+        return shift
+
+    def match_boyer(self, text, max_match = 0, count_only = False):
+        """(indexes, count) of every occurrence, count_only leaves indexes empty"""
+        positions, m = self.positions, self.m
         n = len(text)
-        i = 0  # index in text
+        if m == 0:
+            return [], 0
+        last, good_suffix = self.last, self.good_suffix
+        rare = self.rare
+        rare_chars = positions[rare]
+        hits = {}
+        period = good_suffix[0]
+
+        i = 0  # window start in text
+        memory = 0  # Galil: pattern[:memory] is known to match the window
         word_counter = 0
         word_indexes = []
-        while i <= n - self.m:
-            if word_counter >= max_match and max_match != 0:
-                break
-            j = self.m - 1  # start from right of pattern
+        while i <= n - m:
+            # Skip loop: align the window on the next occurrence of the rare char
+            if text[i + rare] not in rare_chars:
+                k = find_any(text, rare_chars, i + rare + 1, hits)
+                if k < 0 or k - rare > n - m:
+                    break
+                i = k - rare
+                memory = 0
 
             # compare pattern from right to left
-            while j >= 0 and self.pattern[j] == text[i + j]:
+            j = m - 1
+            while j >= memory and text[i + j] in positions[j]:
                 j -= 1
 
-            if j < 0:
-                # match found
-                #print("Pattern found at index", i)
-                word_indexes.append(i)
+            if j < memory:
+                if not count_only:
+                    word_indexes.append(i)
                 word_counter += 1
-                # shift pattern completely after match or default
-                if i + self.m < n:
-                    next_char = text[i + self.m]
-                    i += self.hoops.get(next_char, self.hoops['*'])
-                else:
-                    i += 1
+                if word_counter >= max_match and max_match != 0:
+                    break
+                i += period
+                memory = m - period
             else:
-                # mismatch: shift according to bad-character table
-                bad_char = text[i + j] # get the character where there was a mismatch
-                i += self.hoops.get(bad_char, self.hoops['*'])
+                bad_char = j - last.get(text[i + j], -1)
+                i += max(bad_char, good_suffix[j + 1])
+                memory = 0
 
         return word_indexes, word_counter
+
+    def count(self, text, max_match = 0):
+        return self.match_boyer(text, max_match, count_only=True)[1]
+
+    def exists(self, text):
+        return self.match_boyer(text, 1, count_only=True)[1] > 0
+
+
+class Horspool:
+    """
+    Boyer-Moore-Horspool: only the bad character rule, applied to the last char
+    of the window. Windows are compared with str.startswith (C speed) after the
+    same rare-char skip loop as Boyer (char by char with ignore_case). Simpler
+    tables, usually the fastest for natural-language text.
+    """
+
+    def __init__(self, pattern, ignore_case=False):
+        self.pattern = pattern
+        self.ignore_case = ignore_case
+        self.m = len(pattern)
+        self.positions = variant_table(pattern) if ignore_case else pattern
+        self.shift = self.compute_shift(self.positions)
+        self.rare = rarest_position(pattern, ignore_case) if pattern else 0
+
+    def compute_shift(self, positions):
+        """shift[c] = distance from the last occurrence of c (last char excluded) to the end"""
+        m = len(positions)
+        shift = {}
+        for i in range(m - 1):
+            for c in positions[i]:
+                shift[c] = m - 1 - i
+        return shift
+
+    def matches_at(self, text, i) -> bool:
+        if not self.ignore_case:
+            return text.startswith(self.pattern, i)
+        positions = self.positions
+        return all(text[i + k] in positions[k] for k in range(self.m))
+
+    def match_horspool(self, text, max_match = 0, count_only = False):
+        """(indexes, count) of every occurrence, count_only leaves indexes empty"""
+        m = self.m
+        n = len(text)
+        if m == 0:
+            return [], 0
+        shift = self.shift
+        rare = self.rare
+        rare_chars = self.positions[rare]
+        hits = {}
+
+        i = 0
+        word_counter = 0
+        word_indexes = []
+        while i <= n - m:
+            if text[i + rare] not in rare_chars:
+                k = find_any(text, rare_chars, i + rare + 1, hits)
+                if k < 0 or k - rare > n - m:
+                    break
+                i = k - rare
+
+            if self.matches_at(text, i):
+                if not count_only:
+                    word_indexes.append(i)
+                word_counter += 1
+                if word_counter >= max_match and max_match != 0:
+                    break
+            i += shift.get(text[i + m - 1], m)
+
+        return word_indexes, word_counter
+
+    def count(self, text, max_match = 0):
+        return self.match_horspool(text, max_match, count_only=True)[1]
+
+    def exists(self, text):
+        return self.match_horspool(text, 1, count_only=True)[1] > 0
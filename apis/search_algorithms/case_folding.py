@@ -0,0 +1,16 @@
+from functools import lru_cache
+from typing import FrozenSet
+
+
+@lru_cache(maxsize=4096)
+def case_variants(c: str) -> FrozenSet[str]:
+    """
+    Chars matching `c` when the case is ignored: c itself and its lower/upper
+    case forms (forms that aren't a single char, like 'ß'.upper(), are dropped).
+    """
+    return frozenset(v for v in (c, c.lower(), c.upper()) if len(v) == 1)
+
+
+def variant_table(pattern: str):
+    """For each position of `pattern`, the set of text chars it matches ignoring case"""
+    return [case_variants(c) for c in pattern]
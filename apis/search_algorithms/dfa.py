@@ -1,14 +1,194 @@
-from search_algorithms.nfa import NFA
-from collections import deque
-class DFA:
-    def __init__(self, nfa: NFA):
-        self.nfa = nfa
-        self.alphabet = [s for s in nfa.alphabet if s != 'ε']  # DFA alphabet
-        self.start_state = frozenset(self.epsilon_closure(nfa.start_state))
+from search_algorithms.nfa import NFA, SymbolClasses
+from search_algorithms.literals import Prefilter
+from search_algorithms.word_generator import WordEnumerator, TableWordEnumerator
+from collections import deque, defaultdict
+from itertools import islice
+from array import array
+from typing import Optional
+
+# Sentinel used in the compiled table for "no transition"
+DEAD = -1
+
+
+# match_dfa semantics
+ALL_STARTS = "all"          # every start index that begins at least one match
+LEFTMOST_LONGEST = "longest"  # leftmost-longest, non-overlapping matches
+COUNT_ONLY = "count"        # number of match starts, no index list
+
+
+class StateLimitExceeded(Exception):
+    """The subset construction went over its max_states budget"""
+
+
+class RegexScanner:
+    """
+    Matching driver shared by DFA and LazyDFA. Subclasses provide `nfa`,
+    `start` and the three passes: last_match_end, match_starts and
+    longest_match_end, all working on symbol classes (see NFA.encode).
+    """
+    _prefilter = None
+
+    def encode(self, text: str):
+        """Map every char of `text` to its symbol class"""
+        return self.symbols.encode(text)
+
+    def prefilter(self) -> Prefilter:
+        if self._prefilter is None:
+            self._prefilter = Prefilter(self.nfa.regex, self.nfa.ignore_case)
+        return self._prefilter
+
+    def generation_symbols(self):
+        """Every (char, class) pair used to generate words, sorted by char"""
+        return sorted((c, cls) for cls, members in enumerate(self.nfa.class_members) for c in members)
+
+    def word_enumerator(self) -> WordEnumerator:
+        raise NotImplementedError
+
+    def generate_words(self, max_words=100, max_length=20, cursor=None, time_budget=None):
+        """
+        Up to `max_words` accepted strings of length <= max_length, in shortlex
+        order, starting after `cursor` (see WordEnumerator.words).
+        """
+        words = self.word_enumerator().words(max_length, cursor, time_budget)
+        return list(islice(words, max_words))
+
+    def match_dfa(self, text: str, max_matches: int = 0, semantics: str = ALL_STARTS):
+        """
+        Find the substrings of `text` accepted by the DFA.
+        semantics:
+          - ALL_STARTS       : every index where a (non empty) match starts
+          - LEFTMOST_LONGEST : leftmost-longest non-overlapping matches
+          - COUNT_ONLY       : like ALL_STARTS but only the count, indexes is []
+        The prefilter first looks for the pattern's required literal, the DFA
+        only scans the windows that can hold a match.
+        Returns (indexes, count).
+        """
+        if self.start == DEAD or not text:
+            return [], 0
+
+        windows = self.prefilter().windows(text)
+        if windows is None:
+            return self.scan(text, max_matches, semantics)
+
+        indexes = []
+        count = 0
+        for lo, hi in windows:
+            remaining = max_matches - count if max_matches != 0 else 0
+            found, found_count = self.scan(text[lo:hi], remaining, semantics)
+            indexes.extend(i + lo for i in found)
+            count += found_count
+            if max_matches != 0 and count >= max_matches:
+                break
+        return indexes, count
+
+    def count(self, text: str, max_matches: int = 0) -> int:
+        """Number of match starts, no index list is built"""
+        return self.match_dfa(text, max_matches, COUNT_ONLY)[1]
+
+    def exists(self, text: str) -> bool:
+        """
+        True as soon as a match ends: only the forward pass runs, and it stops
+        at the first final state instead of looking for the last one.
+        """
+        if self.start == DEAD or not text:
+            return False
+        windows = self.prefilter().windows(text)
+        if windows is None:
+            windows = [(0, len(text))]
+        return any(self.last_match_end(self.encode(text[lo:hi]), first=True) >= 0 for lo, hi in windows)
+
+    def scan(self, text: str, max_matches: int, semantics: str):
+        """
+        Run the passes over the whole `text`, in O(len(text)) for ALL_STARTS
+        and COUNT_ONLY:
+          - a forward '.*R' pass finds the end of the last match
+          - a reverse pass from there recovers every match start
+        """
+        codes = self.encode(text)
+        last_end = self.last_match_end(codes)
+        if last_end < 0:
+            return [], 0
+
+        if semantics == COUNT_ONLY:
+            _, count = self.match_starts(codes, last_end, count_only=True)
+            if max_matches != 0:
+                count = min(count, max_matches)
+            return [], count
+
+        starts, _ = self.match_starts(codes, last_end)
+        starts.reverse()
+
+        if semantics == ALL_STARTS:
+            if max_matches != 0:
+                starts = starts[:max_matches]
+            return starts, len(starts)
+
+        if semantics == LEFTMOST_LONGEST:
+            matches = []
+            position = 0
+            for start in starts:
+                if start < position:
+                    continue  # overlaps the previous match
+                if max_matches != 0 and len(matches) >= max_matches:
+                    break
+                matches.append(start)
+                position = self.longest_match_end(codes, start) + 1
+            return matches, len(matches)
+
+        raise ValueError(f"Unknown match semantics: {semantics}")
+
+
+class DFA(RegexScanner):
+    def __init__(self, nfa: NFA, reverse: bool = False, unanchored: bool = False,
+                 max_states: Optional[int] = None):
+        """
+        reverse    : build the DFA of the reversed language (scans right to left)
+        unanchored : behave as if the pattern was prefixed by '.*', a match may
+                     start at any position and the DFA never dies
+        max_states : raise StateLimitExceeded when the subset construction
+                     reaches more states (the scanning DFAs get the same budget
+                     and fall back to a LazyDFA, see scanners)
+        """
+        self._nfa = nfa
+        self.pattern = nfa.regexPattern
+        self.ignore_case = nfa.ignore_case
+        self.reverse = reverse
+        self.unanchored = unanchored
+        self.max_states = max_states
+        self.nfa_transitions = self.reverse_transitions(nfa.class_transitions) if reverse else nfa.class_transitions
+        self.accept_state = nfa.start_state if reverse else nfa.final_state
+        # The DFA reads symbol classes, not chars
+        self.classes = nfa.classes
+        self.n_classes = nfa.n_classes
+        self.symbols = nfa.symbols
+        # States re-injected at every step in unanchored mode
+        self.restart = frozenset(self.epsilon_closure(nfa.final_state if reverse else nfa.start_state))
+        self.start_state = frozenset() if unanchored else self.restart
+        self._scanners = None
+        self.lazy_scanner = None
+        self._generation_symbols = None
         self.transitions = {}
         self.final_states = set()
         self.build_dfa()
         self.detect_final_states()
+        self.compile()
+
+    @property
+    def nfa(self) -> NFA:
+        """The NFA, rebuilt from the pattern (linear time) by a DFA loaded with restore"""
+        if self._nfa is None:
+            self._nfa = NFA(self.pattern, ignore_case=self.ignore_case)
+        return self._nfa
+
+    @staticmethod
+    def reverse_transitions(transitions):
+        """Flip every NFA edge: {to_state: {symbol: [from_states]}}"""
+        reversed_transitions = {}
+        for from_state, trans in transitions.items():
+            for symbol, to_states in trans.items():
+                for to_state in to_states:
+                    reversed_transitions.setdefault(to_state, {}).setdefault(symbol, []).append(from_state)
+        return reversed_transitions
 
     # -----------------------------
     # Epsilon closure
@@ -22,7 +202,7 @@ class DFA:
 
         while stack:
             state = stack.pop()
-            for t in self.nfa.transitions.get(state, {}).get('ε', []):
+            for t in self.nfa_transitions.get(state, {}).get('ε', []):
                 if t not in closure:
                     closure.add(t)
                     stack.append(t)
@@ -32,130 +212,366 @@ class DFA:
     # Build DFA
     # -----------------------------
     def build_dfa(self):
-        queue = [self.start_state]
-        visited = set()
+        queue = deque([self.start_state])
+        seen = {self.start_state}
 
         while queue:
-            current = queue.pop(0)
-            if current in visited:
-                continue
-            visited.add(current)
-
+            current = queue.popleft()
             self.transitions[current] = {}
 
-            for symbol in self.alphabet:
-                # Collect all NFA states reachable by this symbol
+            # In unanchored mode a new match may start before every character
+            sources = current | self.restart if self.unanchored else current
+            for cls in range(self.n_classes):
+                # Collect all NFA states reachable by this symbol class
                 next_states = set()
-                for s in current:
-                    next_states.update(self.nfa.transitions.get(s, {}).get(symbol, []))
+                for s in sources:
+                    next_states.update(self.nfa_transitions.get(s, {}).get(cls, []))
                 # Take epsilon closure of the result
-                if next_states:
+                if next_states or self.unanchored:
                     closure = frozenset(self.epsilon_closure(next_states))
-                    self.transitions[current][symbol] = closure
-                    if closure not in visited and closure not in queue:
+                    self.transitions[current][cls] = closure
+                    if closure not in seen:
+                        seen.add(closure)
                         queue.append(closure)
+                        if self.max_states is not None and len(seen) > self.max_states:
+                            raise StateLimitExceeded(f"DFA over {self.max_states} states")
                 else:
-                    self.transitions[current][symbol] = frozenset()
+                    self.transitions[current][cls] = frozenset()
 
     # -----------------------------
     # Detect DFA final states
     # -----------------------------
     def detect_final_states(self):
         for state in self.transitions:
-            if self.nfa.final_state in state:
+            if self.accept_state in state:
                 self.final_states.add(state)
 
+    # -----------------------------
+    # Compile: minimize + dense table
+    # -----------------------------
+    def compile(self):
+        """
+        Minimize the subset-construction DFA (Hopcroft) and renumber its
+        states to small ints, start state first.
+        Produces:
+          - self.table   : flat array, table[state * n_classes + cls] -> next state or DEAD
+          - self.finals  : bytearray, finals[state] == 1 if the state is accepting
+        """
+        # Number the subset states, the extra last one is an explicit dead state
+        subsets = list(self.transitions)
+        index = {subset: i for i, subset in enumerate(subsets)}
+        dead = len(subsets)
+        delta = []
+        for subset in subsets:
+            row = [dead] * self.n_classes
+            for cls, target in self.transitions[subset].items():
+                if target or self.unanchored:
+                    row[cls] = index[target]
+            delta.append(row)
+        delta.append([dead] * self.n_classes)
+        accepting = [subset in self.final_states for subset in subsets] + [False]
+
+        block_of = self.hopcroft(delta, accepting)
+
+        # Renumber the blocks in BFS order from the start, skipping the dead block
+        dead_block = block_of[dead]
+        start_block = block_of[index[self.start_state]]
+        numbering = {}
+        rows = []
+        if start_block != dead_block:
+            numbering[start_block] = 0
+            queue = deque([index[self.start_state]])
+            while queue:
+                s = queue.popleft()
+                row = []
+                for cls in range(self.n_classes):
+                    t = delta[s][cls]
+                    b = block_of[t]
+                    if b == dead_block:
+                        row.append(DEAD)
+                        continue
+                    if b not in numbering:
+                        numbering[b] = len(numbering)
+                        queue.append(t)
+                    row.append(numbering[b])
+                rows.append((s, row))
+
+        self.n_states = len(numbering)
+        self.start = 0 if self.n_states else DEAD
+        self.table = array('i', [DEAD]) * (self.n_states * self.n_classes)
+        self.finals = bytearray(self.n_states)
+        for s, row in rows:
+            state = numbering[block_of[s]]
+            self.table[state * self.n_classes:(state + 1) * self.n_classes] = array('i', row)
+            self.finals[state] = 1 if accepting[s] else 0
+
+        # Only the dense table is read from now on: drop the subset construction
+        self.transitions = self.final_states = None
+        self.nfa_transitions = self.restart = self.start_state = None
+
+    def hopcroft(self, delta, accepting):
+        """
+        Hopcroft partition refinement over a complete DFA.
+        Returns block_of[state] -> equivalence class id.
+        """
+        n = len(delta)
+        inverse = [defaultdict(list) for _ in range(self.n_classes)]
+        for s in range(n):
+            for cls in range(self.n_classes):
+                inverse[cls][delta[s][cls]].append(s)
+
+        finals = {s for s in range(n) if accepting[s]}
+        others = set(range(n)) - finals
+        blocks = [b for b in (finals, others) if b]
+        block_of = [0] * n
+        for b, members in enumerate(blocks):
+            for s in members:
+                block_of[s] = b
+
+        work = deque(range(len(blocks)))
+        in_work = set(work)
+        while work:
+            splitter = work.popleft()
+            in_work.discard(splitter)
+            # The splitter itself may get split below, keep its members as popped
+            members = blocks[splitter]
+            for cls in range(self.n_classes):
+                sources = set()
+                for t in members:
+                    sources.update(inverse[cls].get(t, ()))
+                if not sources:
+                    continue
+
+                hits = defaultdict(set)
+                for s in sources:
+                    hits[block_of[s]].add(s)
+
+                for b, inside in hits.items():
+                    if len(inside) == len(blocks[b]):
+                        continue
+                    outside = blocks[b] - inside
+                    blocks[b] = inside
+                    new = len(blocks)
+                    blocks.append(outside)
+                    for s in outside:
+                        block_of[s] = new
+                    if b in in_work or len(outside) <= len(inside):
+                        work.append(new)
+                        in_work.add(new)
+                    else:
+                        work.append(b)
+                        in_work.add(b)
+        return block_of
+
+    # -----------------------------
+    # Serialization (see matcher_codec)
+    # -----------------------------
+    def export(self):
+        """
+        (header, arrays) describing the compiled DFA: its dense table and final
+        states, those of the scanning DFAs when they were built, the class map
+        and the prefilter. No subset construction data, no lookup table.
+        """
+        automata = [self] + list(self._scanners or ())
+        header = {
+            "pattern": self.pattern,
+            "ignore_case": self.ignore_case,
+            "max_states": self.max_states,
+            "classes": self.classes,
+            "n_classes": self.n_classes,
+            "prefilter": self.prefilter().fields(),
+            "automata": [{"start": auto.start, "n_states": auto.n_states} for auto in automata]
+        }
+        arrays = []
+        for auto in automata:
+            arrays += [auto.table, array('B', auto.finals)]
+        return header, arrays
+
+    @classmethod
+    def restore(cls, header: dict, arrays) -> "DFA":
+        """
+        The DFA exported by export(), without any subset construction. Its NFA
+        is only rebuilt if needed (scanning DFAs not exported, word generation).
+        Raises ValueError on inconsistent tables.
+        """
+        n_classes = header["n_classes"]
+        classes = {c: int(value) for c, value in header["classes"].items()}
+        if n_classes < 1 or any(not 0 <= value < n_classes for value in classes.values()):
+            raise ValueError("Invalid class map")
+        symbols = SymbolClasses(classes, n_classes)
+        descriptions = header["automata"]
+        if not 1 <= len(descriptions) <= 3 or len(descriptions) == 2 or len(arrays) != 2 * len(descriptions):
+            raise ValueError("Invalid automata")
+
+        automata = []
+        for k, description in enumerate(descriptions):
+            dfa = cls.__new__(cls)
+            dfa._nfa = None
+            dfa.pattern = header["pattern"]
+            dfa.ignore_case = bool(header["ignore_case"])
+            dfa.max_states = header["max_states"]
+            dfa.reverse = k == 2
+            dfa.unanchored = k > 0
+            dfa.classes = classes
+            dfa.n_classes = n_classes
+            dfa.symbols = symbols
+            dfa._scanners = None
+            dfa.lazy_scanner = None
+            dfa._generation_symbols = None
+            dfa.n_states = int(description["n_states"])
+            dfa.start = int(description["start"])
+            dfa.table = arrays[2 * k]
+            dfa.finals = bytearray(arrays[2 * k + 1])
+            if len(dfa.table) != dfa.n_states * n_classes or len(dfa.finals) != dfa.n_states \
+                    or dfa.start != (0 if dfa.n_states else DEAD) \
+                    or (dfa.table and (min(dfa.table) < DEAD or max(dfa.table) >= dfa.n_states)):
+                raise ValueError("Invalid transition table")
+            automata.append(dfa)
+
+        dfa = automata[0]
+        dfa._prefilter = Prefilter.from_fields(header["prefilter"])
+        if len(automata) == 3:
+            dfa._scanners = (automata[1], automata[2])
+        return dfa
+
     # -----------------------------
     # Display DFA transition table
     # -----------------------------
     def display_transition_table(self):
-        print("\n=== DFA Transition Table ===")
-        print(f"Start state: {set(self.start_state)}")
-        print(f"Final states: {[set(s) for s in self.final_states]}\n")
+        print("\n=== DFA Transition Table (minimized) ===")
+        print(f"Start state: {self.start}")
+        print(f"Final states: {[s for s in range(self.n_states) if self.finals[s]]}\n")
 
-        header = f"{'State':<30} | " + " | ".join(f"{s:<15}" for s in self.alphabet)
+        labels = ["".join(members) or "other" for members in self.nfa.class_members]
+        labels[0] = "other"
+        header = f"{'State':<8} | " + " | ".join(f"{label:<5}" for label in labels)
         print(header)
         print("-" * len(header))
 
-        for state, trans in self.transitions.items():
-            state_label = ",".join(sorted(state))
+        for state in range(self.n_states):
             marker = ""
-            if state == self.start_state:
+            if state == self.start:
                 marker += "*"
-            if state in self.final_states:
+            if self.finals[state]:
                 marker += ">"
-            row = f"{state_label:<28}{marker:<2} | "
-            for symbol in self.alphabet:
-                targets = trans.get(symbol, frozenset())
-                targets_str = ",".join(sorted(targets)) if targets else "∅"
-                row += f"{targets_str:<15} | "
+            row = f"{state:<6}{marker:<2} | "
+            for cls in range(self.n_classes):
+                target = self.table[state * self.n_classes + cls]
+                targets_str = str(target) if target != DEAD else "∅"
+                row += f"{targets_str:<5} | "
             print(row)
         print("\n* for start state, > for final state")
 
     # -----------------------------
     # Match word using DFA
     # -----------------------------
-    def match_dfa(self, text: str, max_matches: int = 0):
+    def scanners(self):
         """
-        Find all substrings in `text` that are accepted by the DFA.
-        Returns a list of tuples: (matched_substring, start_index)
+        Lazily build the two DFAs used for unanchored scanning:
+          - forward : '.*R', final exactly at the end index of a match
+          - reverse : '.*reverse(R)', run right to left, final exactly at a match start
+        Returns None when they don't fit in max_states: the scanning passes
+        then run on a LazyDFA (bounded state cache) instead.
         """
-        matches = []
+        if self._scanners is None and self.lazy_scanner is None:
+            try:
+                self._scanners = (DFA(self.nfa, unanchored=True, max_states=self.max_states),
+                                  DFA(self.nfa, reverse=True, unanchored=True, max_states=self.max_states))
+            except StateLimitExceeded:
+                from search_algorithms.lazy_dfa import LazyDFA  # lazy_dfa imports this module
+                self.lazy_scanner = LazyDFA(self.nfa)
+            else:
+                self.release_nfa()
+        return self._scanners
 
-        for start in range(len(text)):
-            current_state = self.start_state
-            for end in range(start, len(text)):
-                if max_matches != 0 and len(matches) >= max_matches:
-                    return matches, len(matches)
-
-                char = text[end]
-                if char not in self.alphabet:
-                    break  # stop this substring
-                current_state = self.transitions.get(current_state, {}).get(char, frozenset())
-                if not current_state:
-                    break  # dead end
-                if current_state in self.final_states:
-                    matches.append(start) # Just store the start index
-                    # If you want the actual matched substring, uncomment the next line
-                    #matches.append((text[start:end + 1], start))
-        return matches, len(matches)
-
-    from collections import deque
-
-    "-----------------------------"
-    # Generate words accepted by DFA"
-    def generate_words(self, max_words=100, max_length=20):
-        """
-        Generate up to `max_words` strings accepted by the DFA.
-        Only generates strings of length <= max_length.
-        """
-
-        results = []
-        queue = deque([(self.start_state, "")])  # (state, current_string)
-        visited = set()
-
-        while queue and len(results) < max_words:
-            state, word = queue.popleft()
-
-            # Avoid revisiting infinite loops
-            if (state, word) in visited:
-                continue
-            visited.add((state, word))
-
-            # If current DFA state is accepting
-            if state in self.final_states:
-                results.append(word)
-                if len(results) >= max_words:
+    def release_nfa(self):
+        """
+        Drop the NFA once the scanners are built, keeping the prefilter and the
+        word generation symbols: a cached DFA then only holds its tables. The
+        NFA is rebuilt from the pattern if it is ever needed again (display).
+        """
+        self.prefilter()
+        self.generation_symbols()
+        for scanner in self._scanners:
+            scanner._nfa = None
+        self._nfa = None
+
+    def generation_symbols(self):
+        if self._generation_symbols is None:
+            self._generation_symbols = super().generation_symbols()
+        return self._generation_symbols
+
+    def nbytes(self) -> int:
+        """Approximate memory held: the tables, and the NFA or lazy scanner still kept"""
+        automata = [self] + list(self._scanners or ())
+        size = sum(auto.table.itemsize * len(auto.table) + len(auto.finals) for auto in automata)
+        size += 64 * len(self.classes)
+        if self.symbols.class_table is not None:
+            size += memoryview(self.symbols.class_table).nbytes
+        if self.lazy_scanner is not None:
+            size += self.lazy_scanner.nbytes()
+        elif self._nfa is not None:
+            size += self._nfa.nbytes()
+        return size
+
+    def last_match_end(self, codes, first: bool = False) -> int:
+        """
+        Single forward pass, returns the index of the last char ending a match
+        (-1 if none), or of the first one with `first`.
+        """
+        scanners = self.scanners()
+        if scanners is None:
+            return self.lazy_scanner.last_match_end(codes, first)
+        forward = scanners[0]
+        table, finals, n_classes = forward.table, forward.finals, forward.n_classes
+        state = forward.start
+        last_end = -1
+        for i, cls in enumerate(codes):
+            state = table[state * n_classes + cls]
+            if finals[state]:
+                last_end = i
+                if first:
                     break
+        return last_end
 
-            # Do not exceed max_length
-            if len(word) >= max_length:
-                continue
+    def match_starts(self, codes, last_end: int, count_only: bool = False):
+        """
+        Single backward pass from `last_end`, yields every index where at least one
+        match starts, in decreasing order (or only counts them).
+        """
+        scanners = self.scanners()
+        if scanners is None:
+            return self.lazy_scanner.match_starts(codes, last_end, count_only)
+        reverse = scanners[1]
+        table, finals, n_classes = reverse.table, reverse.finals, reverse.n_classes
+        state = reverse.start
+        starts = []
+        count = 0
+        for i in range(last_end, -1, -1):
+            state = table[state * n_classes + codes[i]]
+            if finals[state]:
+                if count_only:
+                    count += 1
+                else:
+                    starts.append(i)
+        return starts, (count if count_only else len(starts))
 
-            # Generate transitions
-            for symbol in self.alphabet:
-                next_state = self.transitions.get(state, {}).get(symbol, frozenset())
-                if next_state:
-                    queue.append((next_state, word + symbol))
+    def longest_match_end(self, codes, start: int) -> int:
+        """Run the anchored DFA from `start` until it dies, returns the last accepting index"""
+        table, finals, n_classes = self.table, self.finals, self.n_classes
+        state = self.start
+        end = -1
+        for i in range(start, len(codes)):
+            state = table[state * n_classes + codes[i]]
+            if state == DEAD:
+                break
+            if finals[state]:
+                end = i
+        return end
 
-        return results
+    # -----------------------------
+    # Generate words accepted by DFA
+    # -----------------------------
+    def word_enumerator(self) -> TableWordEnumerator:
+        return TableWordEnumerator(self.table, self.finals, self.n_classes, self.start,
+                                   self.generation_symbols())
@@ -1,7 +1,14 @@
+from search_algorithms.case_folding import variant_table
+
+
 class KMP:
-    def __init__(self, pattern):
+    def __init__(self, pattern, ignore_case=False):
         self.pattern = pattern
-        self.lps = self.compute_lps(pattern)
+        self.ignore_case = ignore_case
+        # positions[j] = chars matched by pattern[j]: the char itself, or the
+        # set of its case variants (text[i] in positions[j] works for both)
+        self.positions = variant_table(pattern) if ignore_case else pattern
+        self.lps = self.compute_lps(self.positions)
 
     def compute_lps(self, pattern):
         n = len(pattern)
@@ -22,9 +29,11 @@ class KMP:
                     i += 1
         return lps
 
-    def match_kmp(self, text, max_matches = 0):
+    def match_kmp(self, text, max_matches = 0, count_only = False):
+        """(indexes, count) of every occurrence, count_only leaves indexes empty"""
         n = len(text)
-        match = len(self.pattern)
+        positions = self.positions
+        match = len(positions)
         i = j = 0
         word_counter = 0
         word_indexes = []
@@ -32,19 +41,25 @@ class KMP:
         while i < n:
             if word_counter >= max_matches and max_matches != 0:
                 break
-            if self.pattern[j] == text[i]:
+            if text[i] in positions[j]:
                 i += 1
                 j += 1
 
             if j == match:
                 word_counter += 1
-                word_indexes.append(i - j)
+                if not count_only:
+                    word_indexes.append(i - j)
                 j = self.lps[j - 1]
             else:
-                if i < n and self.pattern[j] != text[i]:
+                if i < n and text[i] not in positions[j]:
                     if j != 0:
                         j = self.lps[j-1] # mismatch
                     else:
                         i += 1
         return word_indexes , word_counter
 
+    def count(self, text, max_matches = 0):
+        return self.match_kmp(text, max_matches, count_only=True)[1]
+
+    def exists(self, text):
+        return self.match_kmp(text, 1, count_only=True)[1] > 0
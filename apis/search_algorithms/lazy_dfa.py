@@ -0,0 +1,215 @@
+import sys
+
+from search_algorithms.nfa import NFA
+from search_algorithms.dfa import DFA, DEAD, RegexScanner
+from search_algorithms.nfa_sim import NFASimulator
+from search_algorithms.word_generator import BitWordEnumerator
+
+# Transition not computed yet
+UNKNOWN = -2
+
+
+def epsilon_closure(transitions, states):
+    closure = set(states)
+    stack = list(states)
+    while stack:
+        state = stack.pop()
+        for t in transitions.get(state, {}).get('ε', []):
+            if t not in closure:
+                closure.add(t)
+                stack.append(t)
+    return closure
+
+
+class LazyAutomaton:
+    """
+    Subset-construction automaton whose states are only built when the input
+    reaches them. The state cache is bounded: when it is full it is flushed and
+    rebuilt from the current state. After too many flushes the cache is
+    thrashing, the automaton then keeps only the current states and behaves as
+    a plain NFA simulation.
+    """
+
+    def __init__(self, transitions, restart, accept, n_classes, unanchored,
+                 max_cache_bytes, max_flushes):
+        self.transitions = transitions  # class transitions, see NFA.build_classes
+        self.restart = restart
+        self.accept = accept
+        self.n_classes = n_classes
+        self.unanchored = unanchored
+        self.start_state = frozenset() if unanchored else restart
+        self.max_cache_bytes = max_cache_bytes
+        self.max_flushes = max_flushes
+
+        self.cache = {}          # subset -> state id
+        self.subsets = []        # state id -> subset
+        self.rows = []           # state id -> [next state id | DEAD | UNKNOWN]
+        self.finals = bytearray()
+        self.cache_bytes = 0
+        self.flushes = 0
+        self.simulating = False  # True once the cache thrashed
+
+    # -----------------------------
+    # Cache management
+    # -----------------------------
+    def state_cost(self, subset) -> int:
+        """Memory footprint of one cached state: its row, its subset and the cache entries"""
+        return 8 * self.n_classes + sys.getsizeof(subset) + 200
+
+    def add(self, subset) -> int:
+        state = len(self.subsets)
+        self.cache[subset] = state
+        self.subsets.append(subset)
+        self.rows.append([UNKNOWN] * self.n_classes)
+        self.finals.append(1 if self.accept in subset else 0)
+        self.cache_bytes += self.state_cost(subset)
+        return state
+
+    def flush(self):
+        """Drop every cached state, the lists are cleared in place so scan loops keep valid references"""
+        self.cache.clear()
+        self.subsets.clear()
+        self.rows.clear()
+        del self.finals[:]
+        self.cache_bytes = 0
+        self.flushes += 1
+        if self.flushes > self.max_flushes:
+            self.simulating = True
+
+    def full(self, subset) -> bool:
+        if self.simulating:
+            return len(self.subsets) >= 2
+        return self.cache_bytes + self.state_cost(subset) > self.max_cache_bytes
+
+    def state_id(self, subset) -> int:
+        state = self.cache.get(subset)
+        if state is None:
+            if self.full(subset):
+                self.flush()
+            state = self.add(subset)
+        return state
+
+    # -----------------------------
+    # Subset construction, one transition at a time
+    # -----------------------------
+    def move(self, subset, cls):
+        sources = subset | self.restart if self.unanchored else subset
+        next_states = set()
+        for s in sources:
+            next_states.update(self.transitions.get(s, {}).get(cls, []))
+        return frozenset(epsilon_closure(self.transitions, next_states))
+
+    def step(self, state: int, cls: int) -> int:
+        """Compute (and cache) the transition of `state` on `cls`, may flush the cache"""
+        subset = self.subsets[state]
+        target = self.move(subset, cls)
+        if not target and not self.unanchored:
+            self.rows[state][cls] = DEAD
+            return DEAD
+
+        next_state = self.cache.get(target)
+        if next_state is None:
+            if self.full(target):
+                self.flush()
+                state = self.add(subset)
+            next_state = self.add(target)
+        self.rows[state][cls] = next_state
+        return next_state
+
+
+class LazyDFA(RegexScanner):
+    """
+    Same interface as DFA (match_dfa / generate_words) but the forward, reverse
+    and anchored automata are built on demand with a bounded state cache, so a
+    pathological pattern can't blow up compilation.
+    """
+
+    def __init__(self, nfa: NFA, max_cache_bytes: int = 4 * 1024 * 1024, max_flushes: int = 8):
+        self.nfa = nfa
+        self.classes = nfa.classes
+        self.n_classes = nfa.n_classes
+        self.symbols = nfa.symbols
+
+        def automaton(transitions, start, accept, unanchored):
+            restart = frozenset(epsilon_closure(transitions, {start}))
+            return LazyAutomaton(transitions, restart, accept, self.n_classes, unanchored,
+                                 max_cache_bytes, max_flushes)
+
+        reversed_transitions = DFA.reverse_transitions(nfa.class_transitions)
+        self.anchored = automaton(nfa.class_transitions, nfa.start_state, nfa.final_state, False)
+        self.forward = automaton(nfa.class_transitions, nfa.start_state, nfa.final_state, True)
+        self.backward = automaton(reversed_transitions, nfa.final_state, nfa.start_state, True)
+        self.start = 0
+
+    def nbytes(self) -> int:
+        """Approximate memory held: the NFA and the three state caches as filled so far"""
+        return self.nfa.nbytes() + sum(auto.cache_bytes for auto in (self.anchored, self.forward, self.backward))
+
+    @property
+    def simulating(self) -> bool:
+        return self.anchored.simulating or self.forward.simulating or self.backward.simulating
+
+    # -----------------------------
+    # Scanning passes (see DFA)
+    # -----------------------------
+    def last_match_end(self, codes, first: bool = False) -> int:
+        auto = self.forward
+        rows, finals = auto.rows, auto.finals
+        state = auto.state_id(auto.start_state)
+        last_end = -1
+        for i, cls in enumerate(codes):
+            next_state = rows[state][cls]
+            if next_state == UNKNOWN:
+                next_state = auto.step(state, cls)
+            state = next_state
+            if finals[state]:
+                last_end = i
+                if first:
+                    break
+        return last_end
+
+    def match_starts(self, codes, last_end: int, count_only: bool = False):
+        auto = self.backward
+        rows, finals = auto.rows, auto.finals
+        state = auto.state_id(auto.start_state)
+        starts = []
+        count = 0
+        for i in range(last_end, -1, -1):
+            cls = codes[i]
+            next_state = rows[state][cls]
+            if next_state == UNKNOWN:
+                next_state = auto.step(state, cls)
+            state = next_state
+            if finals[state]:
+                if count_only:
+                    count += 1
+                else:
+                    starts.append(i)
+        return starts, (count if count_only else len(starts))
+
+    def longest_match_end(self, codes, start: int) -> int:
+        auto = self.anchored
+        rows, finals = auto.rows, auto.finals
+        state = auto.state_id(auto.start_state)
+        end = -1
+        for i in range(start, len(codes)):
+            cls = codes[i]
+            next_state = rows[state][cls]
+            if next_state == UNKNOWN:
+                next_state = auto.step(state, cls)
+            if next_state == DEAD:
+                break
+            state = next_state
+            if finals[state]:
+                end = i
+        return end
+
+    # -----------------------------
+    # Generate words accepted by the DFA
+    # -----------------------------
+    def word_enumerator(self) -> BitWordEnumerator:
+        """
+        Word generation runs on the NFA bitsets: enumerating would otherwise
+        build (and keep flushing) the anchored automaton's states.
+        """
+        return NFASimulator(self.nfa).word_enumerator()
@@ -0,0 +1,190 @@
+from typing import List, Optional, Set
+from search_algorithms.astTree import RegExTree, Operation
+
+# Above this many strings an exact set is dropped (the node is "not exact")
+MAX_EXACT = 16
+# If the candidate windows cover more than this fraction of the text, scan it all
+MAX_WINDOW_COVERAGE = 0.5
+
+
+class LiteralInfo:
+    """
+    What every word matched by a regex node has in common:
+      - exact    : the full (small) set of matched words, or None
+      - prefix   : literal every match starts with
+      - suffix   : literal every match ends with
+      - required : literals every match contains
+      - min_len / max_len : match length bounds, max_len is None when unbounded
+    """
+    def __init__(self, exact: Optional[Set[str]], prefix: str, suffix: str,
+                 required: Set[str], min_len: int, max_len: Optional[int]):
+        self.exact = exact
+        self.prefix = prefix
+        self.suffix = suffix
+        self.required = required
+        self.min_len = min_len
+        self.max_len = max_len
+
+    def literals(self) -> List[str]:
+        """Every required literal, longest first"""
+        found = set(self.required)
+        found.update((self.prefix, self.suffix))
+        if self.exact is not None and len(self.exact) == 1:
+            found.update(self.exact)
+        found.discard("")
+        return sorted(found, key=lambda s: (-len(s), s))
+
+
+def common_prefix(a: str, b: str) -> str:
+    n = 0
+    while n < min(len(a), len(b)) and a[n] == b[n]:
+        n += 1
+    return a[:n]
+
+
+def common_suffix(a: str, b: str) -> str:
+    return common_prefix(a[::-1], b[::-1])[::-1]
+
+
+def caseless(s: str) -> bool:
+    return s == s.lower() == s.upper()
+
+
+def analyze(tree: RegExTree) -> LiteralInfo:
+    """Bottom-up literal analysis of a RegExTree"""
+    root = tree.root
+
+    if isinstance(root, str):
+        return LiteralInfo({root}, root, root, {root}, 1, 1)
+
+    if root == Operation.CLASS and not tree.charset.negated and len(tree.charset.chars) == 1:
+        c = next(iter(tree.charset.chars))
+        return LiteralInfo({c}, c, c, {c}, 1, 1)
+
+    if root == Operation.EPSILON:
+        return LiteralInfo({""}, "", "", set(), 0, 0)
+
+    if root == Operation.PROTECTION:
+        return analyze(tree.subTrees[0])
+
+    if root == Operation.CONCAT:
+        left = analyze(tree.subTrees[0])
+        right = analyze(tree.subTrees[1])
+        exact = None
+        if left.exact is not None and right.exact is not None \
+                and len(left.exact) * len(right.exact) <= MAX_EXACT:
+            exact = {x + y for x in left.exact for y in right.exact}
+        single_left = left.exact is not None and len(left.exact) == 1
+        single_right = right.exact is not None and len(right.exact) == 1
+        prefix = left.prefix + right.prefix if single_left else left.prefix
+        suffix = left.suffix + right.suffix if single_right else right.suffix
+        # The end of the left part touches the start of the right part
+        required = left.required | right.required | {left.suffix + right.prefix}
+        max_len = None if left.max_len is None or right.max_len is None else left.max_len + right.max_len
+        return LiteralInfo(exact, prefix, suffix, required, left.min_len + right.min_len, max_len)
+
+    if root == Operation.ALTERN:
+        left = analyze(tree.subTrees[0])
+        right = analyze(tree.subTrees[1])
+        exact = None
+        if left.exact is not None and right.exact is not None \
+                and len(left.exact) + len(right.exact) <= MAX_EXACT:
+            exact = left.exact | right.exact
+        prefix = common_prefix(left.prefix, right.prefix)
+        suffix = common_suffix(left.suffix, right.suffix)
+        required = (left.required & right.required) | {prefix, suffix}
+        max_len = None if left.max_len is None or right.max_len is None else max(left.max_len, right.max_len)
+        return LiteralInfo(exact, prefix, suffix, required, min(left.min_len, right.min_len), max_len)
+
+    if root == Operation.PLUS:
+        sub = analyze(tree.subTrees[0])
+        return LiteralInfo(None, sub.prefix, sub.suffix, set(sub.required), sub.min_len,
+                           None if sub.max_len != 0 else 0)
+
+    if root == Operation.ETOILE:
+        sub = analyze(tree.subTrees[0])
+        return LiteralInfo(None, "", "", set(), 0, None if sub.max_len != 0 else 0)
+
+    # DOT and classes: a single unknown char
+    return LiteralInfo(None, "", "", set(), 1, 1)
+
+
+class Prefilter:
+    """
+    Skip the text the DFA can't match, using the longest literal every match
+    must contain. Occurrences are found with str.find (C speed), the DFA then
+    only runs on the windows around them.
+    With ignore_case only the literals without cased chars (digits,
+    punctuation...) can be searched with str.find.
+    """
+    def __init__(self, tree: RegExTree, ignore_case: bool = False):
+        info = analyze(tree)
+        literals = info.literals()
+        prefix, suffix = info.prefix, info.suffix
+        if ignore_case:
+            literals = [s for s in literals if caseless(s)]
+            prefix = prefix if caseless(prefix) else ""
+            suffix = suffix if caseless(suffix) else ""
+        self.literal = literals[0] if literals else ""
+        self.prefix = prefix
+        self.suffix = suffix
+        self.max_len = info.max_len
+
+    def fields(self) -> dict:
+        return {"literal": self.literal, "prefix": self.prefix, "suffix": self.suffix, "max_len": self.max_len}
+
+    @classmethod
+    def from_fields(cls, fields: dict) -> "Prefilter":
+        """The prefilter fields() came from, without analyzing the regex again"""
+        prefilter = cls.__new__(cls)
+        prefilter.literal = str(fields["literal"])
+        prefilter.prefix = str(fields["prefix"])
+        prefilter.suffix = str(fields["suffix"])
+        prefilter.max_len = None if fields["max_len"] is None else int(fields["max_len"])
+        return prefilter
+
+    def windows(self, text: str):
+        """
+        Returns None when the whole text has to be scanned, otherwise the sorted,
+        disjoint (lo, hi) slices of `text` that contain every match ([] = no match).
+        """
+        literal = self.literal
+        if not literal:
+            return None
+        position = text.find(literal)
+        if position < 0:
+            return []
+        if self.max_len is None:
+            return self.bounds(text)
+
+        m = len(literal)
+        n = len(text)
+        windows = []
+        covered = 0
+        while position >= 0:
+            lo = max(0, position + m - self.max_len)
+            hi = min(n, position + self.max_len)
+            if windows and lo <= windows[-1][1]:
+                covered += hi - windows[-1][1]
+                windows[-1] = (windows[-1][0], hi)
+            else:
+                covered += hi - lo
+                windows.append((lo, hi))
+            if covered > MAX_WINDOW_COVERAGE * n:
+                return None
+            position = text.find(literal, position + 1)
+        return windows
+
+    def bounds(self, text: str):
+        """
+        Unbounded matches: they still start at an occurrence of the prefix and
+        end with an occurrence of the suffix, only [first prefix, last suffix] is scanned.
+        """
+        n = len(text)
+        lo = text.find(self.prefix) if self.prefix else 0
+        hi = text.rfind(self.suffix) + len(self.suffix) if self.suffix else n
+        if lo < 0 or hi < len(self.suffix) or hi <= lo:
+            return []
+        if hi - lo == n:
+            return None
+        return [(lo, hi)]
@@ -1,9 +1,73 @@
-from search_algorithms.astTree import RegEx, RegExTree, Operation
+import codecs
+import string
+from array import array
+from search_algorithms.astTree import RegEx, RegExTree, Operation, CharSet, ANY
+from search_algorithms.simplify import simplify
+from search_algorithms.case_folding import case_variants
+
+# Chars tried for wildcards / negated classes when generating words
+# (the index only stores [a-z0-9] tokens)
+GENERATION_CHARS = string.ascii_lowercase + string.digits
+
+# Chars left untouched by str.translate (outside the lookup table) fall in class 0
+codecs.register_error("other_class", lambda e: ("\x00" * (e.end - e.start), e.end))
+
+
+class SymbolClasses:
+    """
+    Char -> symbol class map, shared by every automaton built from an NFA.
+    The lookup tables of encode are only built on first use, and only go up
+    to the highest explicit char (at least the latin-1 range): every char
+    past them is in class 0.
+    """
+
+    def __init__(self, classes: dict, n_classes: int):
+        self.classes = classes
+        self.n_classes = n_classes
+        self.class_table = None
+        self.translate_table = None
+        self.astral_classes = None
+
+    def build_tables(self):
+        """
+          - self.class_table     : char code -> class
+          - self.translate_table : the same table for str.translate (None if unusable)
+          - self.astral_classes  : {explicit char past U+FFFF: class}
+        """
+        bmp = [c for c in self.classes if ord(c) < 65536]
+        size = max([256] + [ord(c) + 1 for c in bmp])
+        if self.n_classes <= 256:
+            table = bytearray(size)
+        else:
+            table = array('H', bytes(2 * size))
+        for c in bmp:
+            table[ord(c)] = self.classes[c]
+        self.astral_classes = {c: cls for c, cls in self.classes.items() if ord(c) >= 65536}
+        if self.n_classes <= 256 and not self.astral_classes:
+            # Chars past the table are left as is, then sent to class 0 by the encoder
+            self.translate_table = table.decode("latin-1")
+        self.class_table = table
+
+    def encode(self, text: str):
+        """Class of every char of `text`, as bytes when the classes fit in one byte"""
+        if self.class_table is None:
+            self.build_tables()
+        if self.translate_table is not None:
+            return text.translate(self.translate_table).encode("latin-1", "other_class")
+        table = self.class_table
+        size = len(table)
+        astral = self.astral_classes
+        return [table[o] if o < size else astral.get(chr(o), 0) for o in map(ord, text)]
+
 
 class NFA:
-    def __init__(self, regexPattern: str):
+    def __init__(self, regexPattern: str, optimize: bool = True, ignore_case: bool = False):
         self.regex = RegEx(regexPattern).parse()
+        if optimize:
+            self.regex = simplify(self.regex)
         self.regexPattern = regexPattern
+        # Case folding is done by the symbol classes, texts are scanned as is
+        self.ignore_case = ignore_case
         self.node_counter = 0
         self.alphabet = []
         # Build NFA using Thompson's construction
@@ -11,9 +75,11 @@ class NFA:
 
         # Get all states
         self.states = self.get_all_states()
+        # Only displayed, built on first use (states x symbols entries)
+        self._transition_table = None
 
-        # Build transition table
-        self.transition_table = self.build_transition_table()
+        # Partition the chars into symbol classes
+        self.build_classes()
 
     # -----------------------------
     # State generator
@@ -52,6 +118,24 @@ class NFA:
 
             return start, end, transitions
 
+        # Base case: any char (.) or character class
+        elif tree.root in (Operation.DOT, Operation.CLASS):
+            symbol = ANY if tree.root == Operation.DOT else tree.charset
+            start = self.new_node()
+            end = self.new_node()
+            self.alphabet.append(symbol)
+            add_transition(start, end, symbol)
+
+            return start, end, transitions
+
+        # EPSILON (empty word)
+        elif tree.root == Operation.EPSILON:
+            start = self.new_node()
+            end = self.new_node()
+            add_transition(start, end, 'ε')
+
+            return start, end, transitions
+
         # CONCAT operation
         elif tree.root == Operation.CONCAT:
             # Build left subtree
@@ -158,16 +242,23 @@ class NFA:
     # -----------------------------
     # Build transition table
     # -----------------------------
+    @property
+    def transition_table(self):
+        if self._transition_table is None:
+            self._transition_table = self.build_transition_table()
+        return self._transition_table
+
     def build_transition_table(self):
         """
         Build a transition table as a dictionary:
         {state: {symbol: [next_states]}}
         """
         table = {}
+        symbols = list(dict.fromkeys(self.alphabet))
 
         # Initialize all states
         for state in self.states:
-            table[state] = {symbol: [] for symbol in self.alphabet}
+            table[state] = {symbol: [] for symbol in symbols}
             table[state]['ε'] = []  # Epsilon transitions
 
         # Fill in transitions
@@ -177,6 +268,79 @@ class NFA:
 
         return table
 
+    # -----------------------------
+    # Symbol classes
+    # -----------------------------
+    def build_classes(self):
+        """
+        Partition the chars into equivalence classes: two chars share a class
+        when every symbol of the NFA matches both or neither. Class 0 holds every
+        char the pattern doesn't mention. With ignore_case a char matches a symbol
+        when one of its case variants does, so 'a' and 'A' share a class. Builds:
+          - self.classes           : {explicit char: class}
+          - self.n_classes
+          - self.class_members     : chars of each class used to generate words
+          - self.class_transitions : {from_state: {class | 'ε': [to_states]}}
+          - self.symbols           : the SymbolClasses encoding texts
+        """
+        symbols = list(dict.fromkeys(self.alphabet))
+        explicit = set()
+        for symbol in symbols:
+            explicit.update(symbol.chars if isinstance(symbol, CharSet) else symbol)
+
+        def matches_exactly(symbol, c):
+            return symbol.contains(c) if isinstance(symbol, CharSet) else symbol == c
+
+        def matches(symbol, c):
+            if not self.ignore_case:
+                return matches_exactly(symbol, c)
+            variants = case_variants(c)
+            if isinstance(symbol, CharSet) and symbol.negated:
+                return all(matches_exactly(symbol, v) for v in variants)
+            return any(matches_exactly(symbol, v) for v in variants)
+
+        # Case variants get a class too, but aren't used to generate words
+        classified = set(explicit)
+        if self.ignore_case:
+            for c in explicit:
+                classified.update(case_variants(c))
+
+        other = tuple(isinstance(symbol, CharSet) and symbol.negated for symbol in symbols)
+        signatures = {other: 0}
+        self.classes = {}
+        for c in sorted(classified):
+            signature = tuple(matches(symbol, c) for symbol in symbols)
+            self.classes[c] = signatures.setdefault(signature, len(signatures))
+        self.n_classes = len(signatures)
+
+        self.class_members = [[] for _ in range(self.n_classes)]
+        for c in sorted(explicit | set(GENERATION_CHARS)):
+            self.class_members[self.classes.get(c, 0)].append(c)
+
+        self.symbols = SymbolClasses(self.classes, self.n_classes)
+
+        covers = {}
+        for i, symbol in enumerate(symbols):
+            covers[symbol] = [cls for signature, cls in signatures.items() if signature[i]]
+        self.class_transitions = {}
+        for from_state, trans in self.transitions.items():
+            row = {}
+            for symbol, to_states in trans.items():
+                if symbol == 'ε':
+                    row['ε'] = list(to_states)
+                    continue
+                for cls in covers[symbol]:
+                    row.setdefault(cls, []).extend(to_states)
+            self.class_transitions[from_state] = row
+
+    def encode(self, text: str):
+        """Class of every char of `text`, see SymbolClasses.encode"""
+        return self.symbols.encode(text)
+
+    def nbytes(self) -> int:
+        """Rough memory footprint: about 800 bytes per state (edges, class transitions, syntax tree)"""
+        return 800 * len(self.states)
+
     # -----------------------------
     # Display methods
     # -----------------------------
@@ -185,12 +349,12 @@ class NFA:
         print("\n=== NFA Transition Table ===")
         print(f"Initial state: {self.start_state}")
         print(f"Final state: {self.final_state}")
-        print(f"Alphabet: {sorted(self.alphabet)}")
+        print(f"Alphabet: {sorted(map(str, set(self.alphabet)))}")
         print(f"\nStates: {self.states}\n")
 
         # Header
-        symbols = sorted(self.alphabet) + ['ε']
-        header = f"{'State':<8} | " + " | ".join(f"{s:<10}" for s in symbols)
+        symbols = sorted(set(self.alphabet), key=str) + ['ε']
+        header = f"{'State':<8} | " + " | ".join(f"{str(s):<10}" for s in symbols)
         print(header)
         print("-" * len(header))
 
@@ -210,4 +374,4 @@ class NFA:
 
     def __str__(self):
         """String representation of the NFA"""
-        return f"NFA(states={len(self.states)}, alphabet={self.alphabet})"
+        return f"NFA(states={len(self.states)}, alphabet={[str(s) for s in self.alphabet]})"
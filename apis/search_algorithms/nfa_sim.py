@@ -0,0 +1,146 @@
+import sys
+
+from search_algorithms.nfa import NFA
+from search_algorithms.dfa import DFA, RegexScanner
+from search_algorithms.word_generator import BitWordEnumerator
+
+
+class BitAutomaton:
+    """
+    Thompson NFA with integer state ids, a set of states is an int bitmask.
+    For each symbol class only the states with an outgoing edge on it are
+    kept, with the epsilon closure of their targets precomputed.
+    """
+
+    def __init__(self, transitions, start_state, accept_state, states, n_classes):
+        index = {state: i for i, state in enumerate(states)}
+
+        # Epsilon closure of every single state, as a mask
+        closure = [0] * len(states)
+        for state, i in index.items():
+            seen = {state}
+            stack = [state]
+            while stack:
+                s = stack.pop()
+                for t in transitions.get(s, {}).get('ε', []):
+                    if t not in seen:
+                        seen.add(t)
+                        stack.append(t)
+            for s in seen:
+                closure[i] |= 1 << index[s]
+
+        # moves[cls] = {source bit: closure mask of its targets on cls}
+        self.moves = [{} for _ in range(n_classes)]
+        self.movable = [0] * n_classes  # mask of the sources having an edge on cls
+        for state, trans in transitions.items():
+            bit = 1 << index[state]
+            for cls, targets in trans.items():
+                if cls == 'ε':
+                    continue
+                mask = 0
+                for t in targets:
+                    mask |= closure[index[t]]
+                self.moves[cls][bit] = self.moves[cls].get(bit, 0) | mask
+                self.movable[cls] |= bit
+
+        self.start = closure[index[start_state]]
+        self.accept = 1 << index[accept_state]
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the move masks (one dict entry per edge)"""
+        return sum(64 + sys.getsizeof(mask) for moves in self.moves for mask in moves.values())
+
+    def step(self, current: int, cls: int) -> int:
+        sources = current & self.movable[cls]
+        moves = self.moves[cls]
+        following = 0
+        while sources:
+            low = sources & -sources
+            following |= moves[low]
+            sources ^= low
+        return following
+
+
+class NFASimulator(RegexScanner):
+    """
+    Regex matcher running the Thompson NFA directly on bitsets: no subset
+    construction at all, O(len(text) * NFA states) in the worst case.
+    Worth it when the text is short compared to the cost of building a DFA.
+    """
+
+    def __init__(self, nfa: NFA):
+        self.nfa = nfa
+        self.classes = nfa.classes
+        self.n_classes = nfa.n_classes
+        self.symbols = nfa.symbols
+        self.forward = BitAutomaton(nfa.class_transitions, nfa.start_state, nfa.final_state,
+                                    nfa.states, nfa.n_classes)
+        self.backward = BitAutomaton(DFA.reverse_transitions(nfa.class_transitions),
+                                     nfa.final_state, nfa.start_state, nfa.states, nfa.n_classes)
+        self.start = 0
+
+    def nbytes(self) -> int:
+        """Approximate memory held: the NFA and both bit automata"""
+        return self.nfa.nbytes() + self.forward.nbytes() + self.backward.nbytes()
+
+    # -----------------------------
+    # Scanning passes (see DFA)
+    # -----------------------------
+    def last_match_end(self, codes, first: bool = False) -> int:
+        auto = self.forward
+        moves, movable, restart, accept = auto.moves, auto.movable, auto.start, auto.accept
+        current = 0
+        last_end = -1
+        for i, cls in enumerate(codes):
+            # A match may start before every char
+            sources = (current | restart) & movable[cls]
+            following = 0
+            move = moves[cls]
+            while sources:
+                low = sources & -sources
+                following |= move[low]
+                sources ^= low
+            current = following
+            if current & accept:
+                last_end = i
+                if first:
+                    break
+        return last_end
+
+    def match_starts(self, codes, last_end: int, count_only: bool = False):
+        auto = self.backward
+        moves, movable, restart, accept = auto.moves, auto.movable, auto.start, auto.accept
+        current = 0
+        starts = []
+        count = 0
+        for i in range(last_end, -1, -1):
+            cls = codes[i]
+            sources = (current | restart) & movable[cls]
+            following = 0
+            move = moves[cls]
+            while sources:
+                low = sources & -sources
+                following |= move[low]
+                sources ^= low
+            current = following
+            if current & accept:
+                if count_only:
+                    count += 1
+                else:
+                    starts.append(i)
+        return starts, (count if count_only else len(starts))
+
+    def longest_match_end(self, codes, start: int) -> int:
+        auto = self.forward
+        current = auto.start
+        end = -1
+        for i in range(start, len(codes)):
+            current = auto.step(current, codes[i])
+            if not current:
+                break
+            if current & auto.accept:
+                end = i
+        return end
+
+    def word_enumerator(self) -> BitWordEnumerator:
+        return BitWordEnumerator(self.forward, self.backward, self.generation_symbols())
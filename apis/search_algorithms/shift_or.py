@@ -0,0 +1,101 @@
+from search_algorithms.astTree import RegEx, Operation, ANY
+from search_algorithms.simplify import flatten
+from search_algorithms.case_folding import case_variants
+
+# Patterns have to fit in a machine word
+MAX_PATTERN_LENGTH = 63
+
+
+class ShiftOr:
+    """
+    Bit-parallel (Shift-And) matcher for short patterns made of literal chars,
+    '.' and [...] classes, e.g. "h[ae]llo" or "[0-9][0-9]:.."
+    Bit i of the state is set when the last i+1 chars match the first i+1
+    positions of the pattern, each text char costs one mask lookup plus a
+    shift and an and.
+    """
+
+    def __init__(self, pattern: str, ignore_case: bool = False):
+        self.pattern = pattern
+        self.ignore_case = ignore_case
+        self.positions = self.parse_positions(pattern)
+        self.m = len(self.positions)
+        if self.m > MAX_PATTERN_LENGTH:
+            raise ValueError(f"Shift-Or pattern longer than {MAX_PATTERN_LENGTH} positions")
+        self.accept = 1 << (self.m - 1)
+        self.masks, self.default_mask = self.compute_masks()
+
+    def parse_positions(self, pattern: str):
+        """(chars, negated) for each position of the pattern"""
+        tree = RegEx(pattern).parse()
+        positions = []
+        for t in flatten(tree, Operation.CONCAT):
+            if isinstance(t.root, str):
+                positions.append((frozenset(t.root), False))
+            elif t.root == Operation.DOT:
+                positions.append((ANY.chars, ANY.negated))
+            elif t.root == Operation.CLASS:
+                positions.append((t.charset.chars, t.charset.negated))
+            else:
+                raise ValueError("Shift-Or only supports chars, '.' and [...] classes")
+        return positions
+
+    def fold(self, c: str) -> str:
+        return c.lower() if self.ignore_case else c
+
+    def compute_masks(self):
+        """
+        masks[c] = bits of the positions matching c, default_mask for every char
+        the pattern doesn't mention (only the negated positions match them).
+        With ignore_case both the lower and upper variant of a char get the mask.
+        """
+        folded = [({self.fold(c) for c in chars}, negated) for chars, negated in self.positions]
+        explicit = set()
+        for chars, _ in self.positions:
+            for c in chars:
+                explicit.update(case_variants(c) if self.ignore_case else (c,))
+
+        masks = {}
+        for c in explicit:
+            mask = 0
+            for i, (chars, negated) in enumerate(folded):
+                if (self.fold(c) in chars) != negated:
+                    mask |= 1 << i
+            masks[c] = mask
+
+        default_mask = 0
+        for i, (_, negated) in enumerate(folded):
+            if negated:
+                default_mask |= 1 << i
+        return masks, default_mask
+
+    def match_shift_or(self, text, max_matches=0):
+        masks, default_mask, accept = self.masks, self.default_mask, self.accept
+        m = self.m
+        state = 0
+        word_counter = 0
+        word_indexes = []
+        for i, c in enumerate(text):
+            state = ((state << 1) | 1) & masks.get(c, default_mask)
+            if state & accept:
+                word_indexes.append(i - m + 1)
+                word_counter += 1
+                if word_counter >= max_matches and max_matches != 0:
+                    break
+        return word_indexes, word_counter
+
+    def count(self, text, max_matches=0):
+        """Same scan as match_shift_or without building the index list"""
+        masks, default_mask, accept = self.masks, self.default_mask, self.accept
+        state = 0
+        word_counter = 0
+        for c in text:
+            state = ((state << 1) | 1) & masks.get(c, default_mask)
+            if state & accept:
+                word_counter += 1
+                if word_counter >= max_matches and max_matches != 0:
+                    break
+        return word_counter
+
+    def exists(self, text):
+        return self.count(text, 1) > 0
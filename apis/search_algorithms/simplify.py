@@ -0,0 +1,171 @@
+from typing import List
+from search_algorithms.astTree import RegExTree, Operation, CharSet
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def key(tree: RegExTree):
+    """Structural key, two trees with the same key denote the same expression"""
+    return (tree.root, tree.charset, tuple(key(t) for t in tree.subTrees))
+
+
+def flatten(tree: RegExTree, operation: Operation) -> List[RegExTree]:
+    """Operands of a chain of binary `operation` nodes (PROTECTION is see-through)"""
+    result = []
+    stack = [tree]
+    while stack:
+        t = stack.pop()
+        if t.root == Operation.PROTECTION:
+            stack.append(t.subTrees[0])
+        elif t.root == operation:
+            stack.extend(reversed(t.subTrees))
+        else:
+            result.append(t)
+    return result
+
+
+def build(operation: Operation, operands: List[RegExTree]) -> RegExTree:
+    """Rebuild a left-associative chain of binary nodes"""
+    tree = operands[0]
+    for t in operands[1:]:
+        tree = RegExTree(operation, [tree, t])
+    return tree
+
+
+def epsilon() -> RegExTree:
+    return RegExTree(Operation.EPSILON, [])
+
+
+def concat(items: List[RegExTree]) -> RegExTree:
+    flat = []
+    for item in items:
+        flat.extend(t for t in flatten(item, Operation.CONCAT) if t.root != Operation.EPSILON)
+    return build(Operation.CONCAT, flat) if flat else epsilon()
+
+
+# -----------------------------
+# Simplification
+# -----------------------------
+def simplify(tree: RegExTree) -> RegExTree:
+    """
+    Rewrite a RegExTree into an equivalent, smaller one before Thompson's construction:
+      - PROTECTION nodes are dropped
+      - nested stars and pluses collapse: a** -> a*, (a+)* -> a*, a++ -> a+
+      - duplicated alternation branches are removed: a|a -> a
+      - alternation branches are factored like a trie on their common prefixes
+        and suffixes: book|books|booking -> book(ε|s|ing)
+      - single char branches merge into one class: a|b|[cd] -> [abcd]
+    """
+    root = tree.root
+
+    if root == Operation.PROTECTION:
+        return simplify(tree.subTrees[0])
+
+    if not tree.subTrees:
+        return tree
+
+    if root in (Operation.ETOILE, Operation.PLUS):
+        sub = simplify(tree.subTrees[0])
+        if sub.root == Operation.EPSILON:
+            return sub
+        if sub.root in (Operation.ETOILE, Operation.PLUS):
+            if Operation.ETOILE in (root, sub.root):
+                root = Operation.ETOILE
+            sub = sub.subTrees[0]
+        if root == Operation.ETOILE and sub.root == Operation.ALTERN:
+            # (ε|a)* == a*
+            branches = [b for b in flatten(sub, Operation.ALTERN) if b.root != Operation.EPSILON]
+            sub = build(Operation.ALTERN, branches)
+        return RegExTree(root, [sub])
+
+    if root == Operation.CONCAT:
+        return concat([simplify(t) for t in flatten(tree, Operation.CONCAT)])
+
+    if root == Operation.ALTERN:
+        branches = []
+        for t in flatten(tree, Operation.ALTERN):
+            branches.extend(flatten(simplify(t), Operation.ALTERN))
+        return factor([flatten(b, Operation.CONCAT) for b in branches])
+
+    return RegExTree(root, [simplify(t) for t in tree.subTrees])
+
+
+def factor(sequences: List[List[RegExTree]]) -> RegExTree:
+    """
+    Build the alternation of the given concatenations (each a list of items,
+    [] or [ε] for the empty word), deduplicated and factored on common prefixes
+    and suffixes.
+    """
+    groups = {}
+    for sequence in sequences:
+        sequence = [t for t in sequence if t.root != Operation.EPSILON]
+        first = key(sequence[0]) if sequence else None
+        groups.setdefault(first, []).append(sequence)
+
+    parts = []
+    for first, group in groups.items():
+        if first is None:
+            parts.append([])
+            continue
+        unique = {}
+        for sequence in group:
+            unique.setdefault(tuple(key(t) for t in sequence), sequence)
+        group = list(unique.values())
+        if len(group) == 1:
+            parts.append(group[0])
+            continue
+        # Longest common prefix of the group (at least the first item)
+        n = 1
+        while all(len(s) > n for s in group) and len({key(s[n]) for s in group}) == 1:
+            n += 1
+        rest = factor([s[n:] for s in group])
+        parts.append(group[0][:n] + [rest])
+
+    parts = merge_chars(parts)
+    if len(parts) == 1:
+        return concat(parts[0])
+
+    # Common suffix shared by every branch
+    n = 0
+    while all(len(p) > n for p in parts) and len({key(p[-1 - n]) for p in parts}) == 1:
+        n += 1
+    if n > 0:
+        head = factor([p[:len(p) - n] for p in parts])
+        return concat([head] + parts[0][len(parts[0]) - n:])
+
+    return build(Operation.ALTERN, [concat(p) for p in parts])
+
+
+def single_chars(tree: RegExTree):
+    """Chars of a literal or non negated class, None for anything else"""
+    if isinstance(tree.root, str):
+        return {tree.root}
+    if tree.root == Operation.CLASS and not tree.charset.negated:
+        return set(tree.charset.chars)
+    return None
+
+
+def merge_chars(parts: List[List[RegExTree]]) -> List[List[RegExTree]]:
+    """Replace the one-char branches of an alternation by a single class"""
+    chars = set()
+    merged = []
+    first = None
+    for part in parts:
+        found = single_chars(part[0]) if len(part) == 1 else None
+        if found is None:
+            merged.append(part)
+            continue
+        chars |= found
+        if first is None:
+            first = len(merged)
+            merged.append(None)
+    if first is None:
+        return parts
+    if len(chars) == 1:
+        tree = RegExTree(chars.pop(), [])
+    else:
+        tree = RegExTree(Operation.CLASS, [])
+        tree.charset = CharSet(frozenset(chars))
+    merged[first] = [tree]
+    return merged
@@ -0,0 +1,68 @@
+import json
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+
+class TermDictionary:
+    """
+    Sorted vocabulary of an inverted index ({word: postings}, as saved by
+    indexService). The sorted list is an implicit trie: the terms sharing a
+    prefix form a contiguous slice, found with bisect.
+    """
+
+    def __init__(self, index: Dict[str, List[Dict]]):
+        self.postings = index
+        self.terms = sorted(index)
+
+    @classmethod
+    def load(cls, path) -> "TermDictionary":
+        with open(Path(path), 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def __len__(self):
+        return len(self.terms)
+
+    def match(self, matcher, max_terms: int = 0) -> List[str]:
+        return list(self.iter_match(matcher, max_terms))
+
+    def iter_match(self, matcher, max_terms: int = 0) -> Iterator[str]:
+        """
+        Every term fully matched by the regex `matcher` (DFA, LazyDFA or
+        NFASimulator), in sorted order, yielded as the walk finds them.
+        The trie of the terms and the automaton are walked in lockstep: a prefix
+        on which the automaton dies skips its whole slice of terms at once, so
+        only the part of the vocabulary the pattern can reach is visited.
+        """
+        auto = matcher.word_enumerator()
+        classes = matcher.classes
+        terms = self.terms
+        found = 0
+        if not terms or auto.exhausted(0):
+            return
+
+        # (lo, hi, depth, state): terms[lo:hi] all start with the same `depth` chars
+        stack = [(0, len(terms), 0, auto.start)]
+        while stack:
+            lo, hi, depth, state = stack.pop()
+            # The prefix itself is a term: the shortest one comes first
+            if len(terms[lo]) == depth:
+                if auto.finishable(state, 0):
+                    yield terms[lo]
+                    found += 1
+                    if max_terms != 0 and found >= max_terms:
+                        return
+                lo += 1
+
+            # One child slice per distinct next char, pushed in reverse so the
+            # smallest one is popped first
+            children = []
+            while lo < hi:
+                c = terms[lo][depth]
+                prefix = terms[lo][:depth] + chr(ord(c) + 1)
+                end = bisect_left(terms, prefix, lo, hi)
+                target = auto.step(state, classes.get(c, 0))
+                if target is not None:
+                    children.append((lo, end, depth + 1, target))
+                lo = end
+            stack.extend(reversed(children))
@@ -0,0 +1,179 @@
+import time
+from bisect import bisect_right
+from typing import Iterator, List, Optional, Tuple
+
+# The time budget is checked every this many DFS steps
+CLOCK_CHECK_INTERVAL = 1024
+
+
+class WordEnumerator:
+    """
+    Shortlex (length, then lexicographic) enumeration of the words of a
+    regular language, as a generator: nothing is stored but the current path.
+    A per-length reachability table ("can this state reach a final state in
+    exactly r more chars") prunes every branch that can't produce a word of
+    the length being enumerated, so no dead prefix is ever extended.
+    Memory is O(max_length * states) for the table plus O(max_length) for the path.
+
+    Subclasses provide `start`, `step(state, cls)` (None when the move is dead)
+    and `reach(r)` / `finishable(state, r)`.
+    """
+
+    def __init__(self, symbols: List[Tuple[str, int]]):
+        # (char, class) pairs, sorted by char
+        self.symbols = symbols
+        self.chars = [c for c, _ in symbols]
+        self.char_classes = dict(symbols)
+        self.used_classes = sorted(set(self.char_classes.values()))
+        # Set when the last enumeration stopped early ("time"), None otherwise
+        self.stopped = None
+
+    def exhausted(self, length: int) -> bool:
+        """True when no state can reach a final state in `length` chars (nor in more)"""
+        raise NotImplementedError
+
+    def words(self, max_length: int = 20, cursor: Optional[str] = None,
+              time_budget: Optional[float] = None) -> Iterator[str]:
+        """
+        Yield the accepted words of length <= max_length in shortlex order.
+        cursor      : resume strictly after this word (the last one of the previous page)
+        time_budget : stop after this many seconds, self.stopped is then "time"
+        """
+        self.stopped = None
+        deadline = time.monotonic() + time_budget if time_budget is not None else None
+        symbols = self.symbols
+        n_symbols = len(symbols)
+        steps = 0
+
+        first_length = len(cursor) if cursor is not None else 0
+        for length in range(first_length, max_length + 1):
+            if self.exhausted(length):
+                return
+            if cursor is not None and length == first_length:
+                if length == 0:
+                    continue
+                stack, chars = self.seek(cursor)
+            else:
+                if not self.finishable(self.start, length):
+                    continue
+                stack, chars = [[self.start, 0]], []
+
+            # DFS, each frame is [state, next symbol to try]
+            while stack:
+                depth = len(stack) - 1
+                if depth == length:
+                    yield "".join(chars)
+                    stack.pop()
+                    if chars:
+                        chars.pop()
+                    continue
+
+                steps += 1
+                if deadline is not None and steps % CLOCK_CHECK_INTERVAL == 0 \
+                        and time.monotonic() > deadline:
+                    self.stopped = "time"
+                    return
+
+                frame = stack[-1]
+                state, position = frame
+                remaining = length - depth - 1
+                while position < n_symbols:
+                    c, cls = symbols[position]
+                    position += 1
+                    target = self.step(state, cls)
+                    if target is not None and self.finishable(target, remaining):
+                        frame[1] = position
+                        stack.append([target, 0])
+                        chars.append(c)
+                        break
+                else:
+                    stack.pop()
+                    if chars:
+                        chars.pop()
+
+    def seek(self, cursor: str):
+        """DFS stack positioned right after `cursor` among the words of its length"""
+        stack = []
+        chars = []
+        state = self.start
+        for depth, c in enumerate(cursor):
+            stack.append([state, bisect_right(self.chars, c)])
+            cls = self.char_classes.get(c)
+            state = self.step(state, cls) if cls is not None else None
+            if state is None or depth == len(cursor) - 1:
+                break
+            chars.append(c)
+        return stack, chars
+
+
+class TableWordEnumerator(WordEnumerator):
+    """Enumeration over a compiled DFA table (DEAD = negative entry)"""
+
+    def __init__(self, table, finals, n_classes: int, start: int, symbols):
+        super().__init__(symbols)
+        self.table = table
+        self.n_classes = n_classes
+        self.n_states = len(finals)
+        self.start = start
+        # reach_table[r][s] = 1 if s reaches a final state in exactly r chars
+        self.reach_table = [bytearray(finals)]
+
+    def reach(self, r: int) -> bytearray:
+        table, n_classes = self.table, self.n_classes
+        while len(self.reach_table) <= r:
+            previous = self.reach_table[-1]
+            current = bytearray(self.n_states)
+            for state in range(self.n_states):
+                base = state * n_classes
+                for cls in self.used_classes:
+                    target = table[base + cls]
+                    if target >= 0 and previous[target]:
+                        current[state] = 1
+                        break
+            self.reach_table.append(current)
+        return self.reach_table[r]
+
+    def exhausted(self, length: int) -> bool:
+        return self.start < 0 or not any(self.reach(length))
+
+    def finishable(self, state: int, r: int) -> bool:
+        return bool(self.reach(r)[state])
+
+    def step(self, state: int, cls: int):
+        target = self.table[state * self.n_classes + cls]
+        return target if target >= 0 else None
+
+
+class BitWordEnumerator(WordEnumerator):
+    """
+    Enumeration straight on the NFA bitsets (see nfa_sim.BitAutomaton), for
+    patterns too large to determinize. The reach table holds masks of NFA
+    states, computed with the reversed automaton.
+    """
+
+    def __init__(self, forward, backward, symbols):
+        super().__init__(symbols)
+        self.forward = forward
+        self.backward = backward
+        self.start = forward.start
+        # Forward states are epsilon-closed: reaching the accept state in 0 chars
+        # means holding it
+        self.reach_table = [backward.start]
+
+    def reach(self, r: int) -> int:
+        while len(self.reach_table) <= r:
+            previous = self.reach_table[-1]
+            current = 0
+            for cls in self.used_classes:
+                current |= self.backward.step(previous, cls)
+            self.reach_table.append(current)
+        return self.reach_table[r]
+
+    def exhausted(self, length: int) -> bool:
+        return not self.reach(length)
+
+    def finishable(self, state: int, r: int) -> bool:
+        return bool(state & self.reach(r))
+
+    def step(self, state: int, cls: int):
+        return self.forward.step(state, cls) or None
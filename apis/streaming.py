@@ -0,0 +1,28 @@
+import json
+from typing import Iterable, Iterator, List, Union
+
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson_lines(records: Iterable[Union[dict, List[dict]]]) -> Iterator[str]:
+    """
+    One JSON object per line, produced as the records are. Every item of
+    `records` is sent as soon as it is produced: a record, or a list of records
+    that are ready together (one write instead of one per record). An error
+    raised once the response has started can't change the status code anymore:
+    it is sent as a last {"error": ...} record.
+    """
+    try:
+        for item in records:
+            block = item if isinstance(item, list) else [item]
+            if block:
+                yield "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in block)
+    except Exception as e:
+        yield json.dumps({"error": str(e)}) + "\n"
+
+
+def ndjson_response(records: Iterable[Union[dict, List[dict]]]) -> StreamingResponse:
+    """Stream `records` (a generator, consumed while the response is sent) as NDJSON"""
+    return StreamingResponse(ndjson_lines(records), media_type=NDJSON_MEDIA_TYPE)